@@ -1,10 +1,8 @@
 from discord.ext import commands
 from discord import app_commands, Interaction, Message
 import logging
-from utils.conversation import ConversationManager
-from utils.user_manager import UserManager
-from utils.discord_utils import send_discord_safe
-from pathlib import Path
+import re
+from utils.discord_utils import format_qa, send_discord_safe
 
 # Character limits for responses
 DEFAULT_CHAR_LIMIT = 1800  # Default limit for responses
@@ -21,51 +19,63 @@ DETAIL_KEYWORDS = [
     "in depth",
     "thorough"
 ]
+_DETAIL_RE = re.compile("|".join(map(re.escape, DETAIL_KEYWORDS)), re.IGNORECASE)
+
+def _build_system_prompt(char_limit: int) -> str:
+    """Generate the system prompt with the appropriate character limit."""
+    return (
+        f"You are a helpful AI assistant in a Discord chat. Your responses should be clear, concise, and well-structured, "
+        f"using Discord's official markdown formatting:\n"
+        f"- Headers: Use # for main titles, ## for section headers, ### for subsection headers\n"
+        f"- **Bold**: Use **text** for emphasis and important points\n"
+        f"- *Italic*: Use *text* or _text_ for emphasis\n"
+        f"- __Underline__: Use __text__ for underlining\n"
+        f"- ~~Strikethrough~~: Use ~~text~~ for corrections or outdated information\n"
+        f"- `Code`: Use `text` for inline code, commands, or technical terms\n"
+        f"- ```Code blocks```: Use ``` for multi-line code examples; add language name for syntax highlighting\n"
+        f"- Lists: Use hyphens (-) for bullet points; use 2 spaces before - for nested bullets\n"
+        f"- Numbered lists: Use 1., 2., etc. for steps or ordered points\n"
+        f"- > Blockquote: Use > for single-line quotes\n"
+        f"- >>> Multi-line quote: Use >>> for extended quotes\n"
+        f"- Masked links: Use [text](URL) format\n"
+        f"- Combine formatting: ***bold and italic***, __**underline and bold**__, etc.\n"
+        f"\n"
+        f"Remember:\n"
+        f"- Discord has a 2000 character limit per message\n"
+        f"- Your response must be under {char_limit} characters\n"
+        f"- If someone requests more detail, you can use up to {EXTENDED_CHAR_LIMIT} characters\n"
+        f"- Keep responses focused and well-organized\n"
+        f"- Use appropriate spacing and formatting for readability (e.g., space after # for headers)\n"
+        f"- Don't use more than 3 hashtags (####, #####) as they don't render properly in Discord"
+    )
+
+# The prompt only varies with the character limit, so build each variant once
+_SYSTEM_PROMPTS = {
+    DEFAULT_CHAR_LIMIT: _build_system_prompt(DEFAULT_CHAR_LIMIT),
+    EXTENDED_CHAR_LIMIT: _build_system_prompt(EXTENDED_CHAR_LIMIT),
+}
 
 class Chat(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.logger = logging.getLogger(__name__)
-        self.logger.setLevel(logging.INFO)
-        self.settings_dir = Path("storage")
-        self.user_manager = UserManager(settings_dir=self.settings_dir)
-        self.conversation_manager = ConversationManager(settings_dir=str(self.settings_dir))
+        self.user_manager = bot.user_manager
+        if bot.conversation_manager is None:
+            raise RuntimeError("ConversationManager is unavailable (is OPENAI_API_KEY set?)")
+        self.conversation_manager = bot.conversation_manager
+        self._mention_re = None
         self.logger.info("Chat cog initialized")
 
     def _get_char_limit(self, message: str) -> int:
         """Determine the character limit based on the message content."""
-        message_lower = message.lower()
-        if any(keyword in message_lower for keyword in DETAIL_KEYWORDS):
-            return EXTENDED_CHAR_LIMIT
-        return DEFAULT_CHAR_LIMIT
-
-    def _get_system_prompt(self, char_limit: int) -> str:
-        """Generate the system prompt with the appropriate character limit."""
-        return (
-            f"You are a helpful AI assistant in a Discord chat. Your responses should be clear, concise, and well-structured, "
-            f"using Discord's official markdown formatting:\n"
-            f"- Headers: Use # for main titles, ## for section headers, ### for subsection headers\n"
-            f"- **Bold**: Use **text** for emphasis and important points\n"
-            f"- *Italic*: Use *text* or _text_ for emphasis\n"
-            f"- __Underline__: Use __text__ for underlining\n"
-            f"- ~~Strikethrough~~: Use ~~text~~ for corrections or outdated information\n"
-            f"- `Code`: Use `text` for inline code, commands, or technical terms\n"
-            f"- ```Code blocks```: Use ``` for multi-line code examples; add language name for syntax highlighting\n"
-            f"- Lists: Use hyphens (-) for bullet points; use 2 spaces before - for nested bullets\n"
-            f"- Numbered lists: Use 1., 2., etc. for steps or ordered points\n"
-            f"- > Blockquote: Use > for single-line quotes\n"
-            f"- >>> Multi-line quote: Use >>> for extended quotes\n"
-            f"- Masked links: Use [text](URL) format\n"
-            f"- Combine formatting: ***bold and italic***, __**underline and bold**__, etc.\n"
-            f"\n"
-            f"Remember:\n"
-            f"- Discord has a 2000 character limit per message\n"
-            f"- Your response must be under {char_limit} characters\n"
-            f"- If someone requests more detail, you can use up to {EXTENDED_CHAR_LIMIT} characters\n"
-            f"- Keep responses focused and well-organized\n"
-            f"- Use appropriate spacing and formatting for readability (e.g., space after # for headers)\n"
-            f"- Don't use more than 3 hashtags (####, #####) as they don't render properly in Discord"
-        )
+        return EXTENDED_CHAR_LIMIT if _DETAIL_RE.search(message) else DEFAULT_CHAR_LIMIT
+
+    def _strip_mention(self, content: str) -> str:
+        """Remove both mention forms of the bot (<@id> and <@!id>) from the content."""
+        # bot.user is only available once logged in, so compile lazily on first use
+        if self._mention_re is None:
+            self._mention_re = re.compile(rf"<@!?{self.bot.user.id}>")
+        return self._mention_re.sub("", content).strip()
 
     @commands.Cog.listener()
     async def on_message(self, message: Message):
@@ -79,57 +89,70 @@ class Chat(commands.Cog):
         
         if is_reply or is_mention:
             try:
-                # If it's a reply, get the referenced message
-                if is_reply:
-                    referenced_message = await message.channel.fetch_message(message.reference.message_id)
+                # If it's a reply (and not already a mention), make sure it targets our bot.
+                # Prefer the message discord.py already resolved over a REST fetch.
+                if is_reply and not is_mention:
+                    referenced_message = message.reference.resolved
+                    if not isinstance(referenced_message, Message):
+                        referenced_message = await message.channel.fetch_message(message.reference.message_id)
                     # Check if the referenced message is from our bot
                     if referenced_message.author.id != self.bot.user.id:
                         return
                 
-                await message.channel.typing()
-                
-                user_id = str(message.author.id)
-                channel_id = str(message.channel.id)
-                
                 # Remove the bot mention from the message content if present
                 content = message.content
                 if is_mention:
-                    content = content.replace(f"<@{self.bot.user.id}>", "").strip()
+                    content = self._strip_mention(content)
+
+                # A bare ping has nothing to answer; skip storage and the LLM call
+                if not content.strip():
+                    await message.reply("Ask me something!")
+                    return
+
+                # Keep the typing indicator alive for the whole generation
+                async with message.channel.typing():
+                    user_id = str(message.author.id)
+                    channel_id = str(message.channel.id)
                 
-                # Determine character limit and system prompt
-                char_limit = self._get_char_limit(content)
-                system_prompt = self._get_system_prompt(char_limit)
+                    # Determine character limit and system prompt
+                    char_limit = self._get_char_limit(content)
+                    system_prompt = _SYSTEM_PROMPTS[char_limit]
                 
-                # Store the user's message and get the conversation
-                conversation = await self.conversation_manager.add_message(
-                    user_id=user_id,
-                    channel_id=channel_id,
-                    content=content,
-                    role="user",
-                    system_prompt=system_prompt
-                )
+                    # Store the user's message and get the conversation
+                    conversation = await self.conversation_manager.add_message(
+                        user_id=user_id,
+                        channel_id=channel_id,
+                        content=content,
+                        role="user",
+                        system_prompt=system_prompt
+                    )
                 
-                if conversation is None:
-                    await message.reply("⚠️ Could not store your message. Please try again.")
-                    return
+                    if conversation is None:
+                        await message.reply("⚠️ Could not store your message. Please try again.")
+                        return
                 
-                # Generate a response using the conversation
-                response = await self.conversation_manager.generate_response(
-                    user_id=user_id,
-                    channel_id=channel_id,
-                    message=content,
-                    conversation=conversation
-                )
+                    # Generate a response using the conversation
+                    response = await self.conversation_manager.generate_response(
+                        user_id=user_id,
+                        channel_id=channel_id,
+                        message=content,
+                        conversation=conversation
+                    )
                 
-                if response is None:
-                    await message.reply("❌ Failed to generate a response.")
-                    return
+                    if response is None:
+                        await message.reply("❌ Failed to generate a response.")
+                        return
                 
-                # Format the response in the same style as /ask
-                formatted_response = f"**Question:** {content}\n\n🧠 **Answer:**\n{response}"
-                # Only wrap in markdown if the response contains code blocks
-                contains_code = "```" in response
-                await send_discord_safe(message, formatted_response, wrap_in_markdown=contains_code)
+                    # Format the response in the same style as /ask
+                    formatted_response = format_qa(content, response)
+                    # Only wrap in markdown if the response contains code blocks
+                    contains_code = "```" in response
+                    await send_discord_safe(
+                        message,
+                        formatted_response,
+                        wrap_in_markdown=contains_code,
+                        contains_code=contains_code or "```" in content
+                    )
                 
             except Exception as e:
                 self.logger.error(f"Error in message handler: {e}", exc_info=True)
@@ -146,7 +169,7 @@ class Chat(commands.Cog):
         try:
             # Determine character limit and system prompt
             char_limit = self._get_char_limit(prompt)
-            system_prompt = self._get_system_prompt(char_limit)
+            system_prompt = _SYSTEM_PROMPTS[char_limit]
             
             # Store the user's message and get the conversation
             conversation = await self.conversation_manager.add_message(
@@ -174,30 +197,20 @@ class Chat(commands.Cog):
                 return
 
             # Format the response and send it safely
-            formatted_response = f"**Question:** {prompt}\n\n🧠 **Answer:**\n{response}"
+            formatted_response = format_qa(prompt, response)
             # Only wrap in markdown if the response contains code blocks
             contains_code = "```" in response
-            await send_discord_safe(interaction, formatted_response, wrap_in_markdown=contains_code)
+            await send_discord_safe(
+                interaction,
+                formatted_response,
+                wrap_in_markdown=contains_code,
+                contains_code=contains_code or "```" in prompt
+            )
 
         except Exception as e:
             self.logger.error(f"Error in /ask command: {e}", exc_info=True)
             await interaction.followup.send(f"❌ Error while generating response: {str(e)}", ephemeral=True)
 
-    # @app_commands.command(name="wipeconvo", description="Clear your chat history with the bot in this channel.")
-    # async def wipeconvo(self, interaction: Interaction):
-    #     await interaction.response.defer(thinking=True)
-
-    #     user_id = str(interaction.user.id)
-    #     channel_id = str(interaction.channel_id)
-
-    #     try:
-    #         await self.conversation_manager.reset_conversation(user_id, channel_id)
-    #         await interaction.followup.send("🧹 Your conversation history has been cleared.")
-    #     except Exception as e:
-    #         self.logger.error(f"Error in /wipeconvo command: {e}", exc_info=True)
-    #         await interaction.followup.send("❌ Failed to clear your conversation.", ephemeral=True)
-
-
 
 async def setup(bot):
     await bot.add_cog(Chat(bot))
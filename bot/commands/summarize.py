@@ -1,20 +1,18 @@
 from discord.ext import commands
 from discord import app_commands, Interaction
-from urllib.parse import urlparse, parse_qs
 from scraper.article_utils import get_article_as_json
 from utils.youtube import process_youtube_video
 from utils.discord_utils import send_discord_safe
 from summarizer.summarizer import summarize_article_full
 from typing import Optional
 import logging
+import re
 
-SUMMARY_LEVELS = {
-    "tl;dr": "Return only 1–2 sentences with key takeaways.",
-    "default": "Summarize the article clearly using prose or sections. Use markdown lists *only* if they match the article structure (e.g. tips, steps, variations). Avoid redundant ingredient listings.",
-    "detailed": "Provide a detailed, paragraph-style summary with rich insights. Use bullet points sparingly—only when listing multi-step tips or insights. Do not summarize recipe steps as a list unless it reflects article intent."
-}
+# Matches youtube.com/watch?...v=<id>, youtube.com/shorts|embed/<id> and youtu.be/<id>
+_YT_RE = re.compile(r"(?:youtube\.com/(?:watch\?(?:.*&)?v=|shorts/|embed/)|youtu\.be/)([\w-]{11})")
 
-LIMITS = {
+# Summary level -> character limit; the per-level instructions live in summarizer.SUMMARY_INSTRUCTIONS
+SUMMARY_LIMITS = {
     "tl;dr": 500,
     "default": 1000,
     "detailed": 1800
@@ -24,7 +22,6 @@ class Summarizer(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.logger = logging.getLogger(__name__)
-        self.logger.setLevel(logging.INFO)
 
     @app_commands.command(name="summarize", description="Summarize an article or YouTube video.")
     @app_commands.describe(url="The link to summarize")
@@ -44,16 +41,14 @@ class Summarizer(commands.Cog):
         await interaction.response.send_message(f"⏳ Attempting to summarize <{url}>...", ephemeral=True)
 
         summary_key = level.value if level else "default"
-        parsed = urlparse(url)
+        limit = SUMMARY_LIMITS[summary_key]
+        youtube_match = _YT_RE.search(url)
 
         # -- YouTube Flow --
-        if "youtube.com" in parsed.netloc or "youtu.be" in parsed.netloc:
+        if youtube_match:
             try:
-                video_id = parse_qs(parsed.query).get("v", [None])[0] if "youtube.com" in parsed.netloc else parsed.path.strip("/")
-                if not video_id:
-                    raise ValueError("Could not parse YouTube video ID.")
-
-                result = await process_youtube_video(video_id, summary_type=summary_key)
+                video_id = youtube_match.group(1)
+                result = await process_youtube_video(video_id, summary_type=summary_key, max_final_chars=limit)
                 if not isinstance(result, dict):
                     return await interaction.followup.send("❌ YouTube summary failed: Unexpected response format.")
                 
@@ -74,6 +69,7 @@ class Summarizer(commands.Cog):
             summary = await summarize_article_full(
                 raw_text,
                 summary_type=summary_key,
+                max_final_chars=limit,
                 title=title,
                 url=url
             )
@@ -2,16 +2,14 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 import logging
-from utils.conversation import ConversationManager
-from pathlib import Path
 
 class User(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.logger = logging.getLogger(__name__)
-        self.logger.setLevel(logging.INFO)
-        self.settings_dir = Path("storage")
-        self.conversation_manager = ConversationManager(settings_dir=str(self.settings_dir))
+        if bot.conversation_manager is None:
+            raise RuntimeError("ConversationManager is unavailable (is OPENAI_API_KEY set?)")
+        self.conversation_manager = bot.conversation_manager
         self.logger.info("User cog initialized")
 
     @app_commands.command(name="wipeconvo", description="Clear your chat history with the bot in this channel.")
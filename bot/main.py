@@ -3,12 +3,23 @@ import os
 import discord
 from discord.ext import commands
 import asyncio
+import hashlib
+import json
 import logging
+from pathlib import Path
 
 # Add project root to sys.path so imports like `from utils...` work
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from config.config import DISCORD_BOT_TOKEN
+from scraper import stealth_scraper
+from summarizer.summarizer import aclose_clients
+from utils.http import aclose_client
+from utils.conversation import ConversationManager
+from utils.user_manager import UserManager
+
+SETTINGS_DIR = Path("storage")
+COMMAND_HASH_FILE = SETTINGS_DIR / ".cmd_hash"
 
 intents = discord.Intents.default()
 intents.message_content = True  # If needed for message-based commands
@@ -21,7 +32,16 @@ async def on_ready():
     print("------")
 
     try:
+        # Global sync is heavily rate-limited, so only sync when the command tree changed
+        payload = [command.to_dict(bot.tree) for command in bot.tree.get_commands()]
+        command_hash = hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+        if COMMAND_HASH_FILE.exists() and COMMAND_HASH_FILE.read_text().strip() == command_hash:
+            print("✅ App commands unchanged, skipping sync.")
+            return
+
         synced = await bot.tree.sync()
+        COMMAND_HASH_FILE.parent.mkdir(parents=True, exist_ok=True)
+        COMMAND_HASH_FILE.write_text(command_hash)
         print(f"✅ Synced {len(synced)} app command(s).")
     except Exception as e:
         print(f"❌ Failed to sync commands: {e}")
@@ -34,19 +54,40 @@ async def load_extensions():
         # "bot.commands.recipe"
         # Add more cogs here if needed
     ]
-    for ext in extensions:
-        try:
-            await bot.load_extension(ext)
+    results = await asyncio.gather(
+        *(bot.load_extension(ext) for ext in extensions),
+        return_exceptions=True
+    )
+    for ext, result in zip(extensions, results):
+        if isinstance(result, Exception):
+            print(f"❌ Failed to load {ext}: {result}")
+        else:
             print(f"✅ Loaded extension: {ext}")
-        except Exception as e:
-            print(f"❌ Failed to load {ext}: {e}")
 
 async def main():
     async with bot:
+        # Shared state for all cogs, constructed once before any extension loads
+        try:
+            bot.conversation_manager = ConversationManager(settings_dir=str(SETTINGS_DIR))
+        except ValueError as e:
+            # Without an OpenAI key only the Chat and User cogs fail to load; the rest still run
+            print(f"❌ Conversations disabled: {e}")
+            bot.conversation_manager = None
+        bot.user_manager = UserManager(settings_dir=SETTINGS_DIR)
         await load_extensions()
-        await bot.start(DISCORD_BOT_TOKEN)
+        try:
+            await bot.start(DISCORD_BOT_TOKEN)
+        finally:
+            if bot.conversation_manager is not None:
+                await bot.conversation_manager.flush()
+            bot.user_manager.flush()
+            await stealth_scraper.shutdown()
+            await aclose_clients()
+            await aclose_client()
 
 if __name__ == "__main__":
+    # Configure logging once; cog loggers inherit this level and format
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
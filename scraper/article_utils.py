@@ -1,18 +1,128 @@
 import re
+import soupsieve as sv
 import trafilatura
-from bs4 import BeautifulSoup
-from markdownify import markdownify as md
-from trafilatura.settings import use_config
+from bs4 import BeautifulSoup, SoupStrainer
+from selectolax.lexbor import LexborHTMLParser
+from resiliparse.extract.html2text import extract_plain_text
+from resiliparse.parse.html import HTMLTree
 from scraper.stealth_scraper import fetch_content
 import json
 
+INGREDIENT_SELECTOR = ".ingredient, .ingredients li, .ingredient-list li, [class*=ingredient]"
+INSTRUCTION_SELECTOR = "ol li, ul li, .mntl-sc-block-group--LI, [class*=instruction], [class*=step]"
+PARAGRAPH_SELECTOR = "div.mntl-sc-block-group--P p, div.mntl-sc-block p"
 
-def extract_text_list_from_dom(soup, selector) -> list[str]:
-    return [
-        el.get_text(strip=True)
-        for el in soup.select(selector)
-        if el.get_text(strip=True)
+# Text extraction: resiliparse by default, trafilatura when forced or as a fallback
+USE_TRAFILATURA = False
+RESILIPARSE_MIN_CHARS = 200
+
+# Used by the BeautifulSoup fallback: the paragraph selector is compiled once up front,
+# the ingredient and instruction selectors are evaluated by hand in a single tree walk
+_PARAGRAPH_SEL = sv.compile(PARAGRAPH_SELECTOR)
+_INGREDIENT_LIST_CLASSES = frozenset({"ingredients", "ingredient-list"})
+_LIST_TAGS = frozenset({"ol", "ul"})
+
+
+def _select_unique(tree, selector) -> list:
+    """Run a CSS selector, dropping repeats Lexbor yields for nodes matched by several parts of a selector list."""
+    return list({node.mem_id: node for node in tree.css(selector)}.values())
+
+
+def extract_text_list_from_dom(tree, selector) -> list[str]:
+    texts = (node.text(strip=True) for node in _select_unique(tree, selector))
+    return [text for text in texts if text]
+
+
+def _extract_dom_fields(html: str) -> dict:
+    """Pull title, ingredient and instruction candidates out of the page DOM.
+
+    Uses selectolax (Lexbor) for parsing and CSS selection, falling back to
+    BeautifulSoup only if Lexbor cannot handle the document.
+    """
+    try:
+        tree = LexborHTMLParser(html)
+    except Exception as e:
+        print(f"[DOM] selectolax failed to parse page, using BeautifulSoup: {e}")
+        return _extract_dom_fields_bs4(html)
+
+    ingredient_nodes = _select_unique(tree, INGREDIENT_SELECTOR)
+    instruction_nodes = _select_unique(tree, INSTRUCTION_SELECTOR)
+
+    instruction_text = [text for text in (node.text(strip=True) for node in instruction_nodes) if text]
+    if len(instruction_text) < 3:
+        print("[🪄] Adding backup paragraph-style instructions.")
+        for para in extract_text_list_from_dom(tree, PARAGRAPH_SELECTOR):
+            if len(para.split()) > 5:
+                instruction_text.append(para)
+
+    title_node = tree.css_first("title")
+    return {
+        "title": title_node.text(strip=True) if title_node else "Untitled",
+        "ingredients_text": [text for text in (node.text(strip=True) for node in ingredient_nodes) if text],
+        "ingredients_html": "\n".join(node.html for node in ingredient_nodes),
+        "instructions_text": instruction_text,
+        "instructions_html": "\n".join(node.html for node in instruction_nodes)
+    }
+
+
+def _has_ancestor(el, names=None, classes=None) -> bool:
+    for parent in el.parents:
+        if names and parent.name in names:
+            return True
+        if classes and classes.intersection(parent.get("class") or ()):
+            return True
+    return False
+
+
+def _extract_dom_fields_bs4(html: str) -> dict:
+    """BeautifulSoup fallback for _extract_dom_fields.
+
+    Only the tags the selectors can match are parsed, and the ingredient and
+    instruction selectors are evaluated together in a single walk of the tree.
+    """
+    strainer = SoupStrainer(["title", "li", "p", "div", "ol", "ul"])
+    soup = BeautifulSoup(html, "lxml", parse_only=strainer)
+
+    ingredient_candidates = []
+    instruction_candidates = []
+    for el in soup.find_all(True):
+        class_list = el.get("class") or []
+        class_attr = " ".join(class_list)
+        is_li = el.name == "li"
+
+        # .ingredient, .ingredients li, .ingredient-list li, [class*=ingredient]
+        if "ingredient" in class_attr or (is_li and _has_ancestor(el, classes=_INGREDIENT_LIST_CLASSES)):
+            ingredient_candidates.append(el)
+
+        # ol li, ul li, .mntl-sc-block-group--LI, [class*=instruction], [class*=step]
+        if (
+            (is_li and _has_ancestor(el, names=_LIST_TAGS))
+            or "mntl-sc-block-group--LI" in class_list
+            or "instruction" in class_attr
+            or "step" in class_attr
+        ):
+            instruction_candidates.append(el)
+
+    instruction_text = [
+        el.get_text(strip=True) for el in instruction_candidates if el.get_text(strip=True)
     ]
+    if len(instruction_text) < 3:
+        print("[🪄] Adding backup paragraph-style instructions.")
+        for para in _PARAGRAPH_SEL.select(soup):
+            text = para.get_text(strip=True)
+            if len(text.split()) > 5:
+                instruction_text.append(text)
+
+    title_tag = soup.find("title")
+    return {
+        "title": title_tag.get_text(strip=True) if title_tag else "Untitled",
+        "ingredients_text": [
+            el.get_text(strip=True) for el in ingredient_candidates if el.get_text(strip=True)
+        ],
+        "ingredients_html": "\n".join(str(el) for el in ingredient_candidates),
+        "instructions_text": instruction_text,
+        "instructions_html": "\n".join(str(el) for el in instruction_candidates)
+    }
 
 
 # def try_scrape_me(url: str) -> dict | None:
@@ -40,9 +150,6 @@ async def get_article_as_json(url: str) -> dict:
     if not html:
         raise ValueError(f"[ERROR] Failed to fetch HTML from: {url}")
 
-    soup = BeautifulSoup(html, "html.parser")
-    page_text = soup.get_text(separator="\n", strip=True)
-
     # Try recipe-scrapers first
     # scraped = try_scrape_me(url)
     # if scraped:
@@ -62,63 +169,43 @@ async def get_article_as_json(url: str) -> dict:
 
 
     # No scrape_me fallback — continue with DOM-based extract
-    ingredient_text = extract_text_list_from_dom(
-        soup,
-        ".ingredient, .ingredients li, .ingredient-list li, [class*=ingredient]"
-    )
-    ingredient_html = "\n".join(str(el) for el in soup.select(
-        ".ingredient, .ingredients li, .ingredient-list li, [class*=ingredient]"
-    ))
-
-    instruction_candidates = soup.select(
-        "ol li, ul li, .mntl-sc-block-group--LI, [class*=instruction], [class*=step]"
-    )
-    instruction_text = [
-        el.get_text(strip=True) for el in instruction_candidates if el.get_text(strip=True)
-    ]
-    instruction_html = "\n".join(str(el) for el in instruction_candidates)
+    dom = _extract_dom_fields(html)
 
-    # Paragraph fallback for instructions
-    if len(instruction_text) < 3:
-        print("[🪄] Adding backup paragraph-style instructions.")
-        paragraphs = soup.select("div.mntl-sc-block-group--P p, div.mntl-sc-block p")
-        for para in paragraphs:
-            text = para.get_text(strip=True)
-            if len(text.split()) > 5:
-                instruction_text.append(text)
-
-    config = use_config()
-    config.set("DEFAULT", "output_format", "xml")
-
-    raw_extracted = trafilatura.extract(html, with_metadata=True, config=config)
-    markdown = md(raw_extracted or "", heading_style="ATX") if raw_extracted else ""
-    clean_text = raw_extracted or ""
-
-    if not clean_text.strip() and markdown.strip():
-        print("[💡] No clean_text found, using markdown fallback.")
-        clean_text = markdown
-
-    title_tag = soup.find("title")
-    title = title_tag.get_text(strip=True) if title_tag else "Untitled"
+    # One extraction pass straight to Markdown serves as both the text and markdown fields
+    markdown = trafilatura.extract(html, output_format="markdown", with_metadata=True) or ""
+    clean_text = markdown
 
     return {
-        "title": title,
+        "title": dom["title"],
         "text": clean_text,
         "markdown": markdown,
         "format_type": "dom_or_fallback",
-        "ingredients_text": ingredient_text,
-        "ingredients_html": ingredient_html,
-        "instructions_text": instruction_text,
-        "instructions_html": instruction_html
+        "ingredients_text": dom["ingredients_text"],
+        "ingredients_html": dom["ingredients_html"],
+        "instructions_text": dom["instructions_text"],
+        "instructions_html": dom["instructions_html"]
     }
 
 
 def extract_text_from_html(html: str) -> dict:
-    """Extract readable content from raw HTML using trafilatura."""
+    """Extract readable content from raw HTML.
+
+    Uses the much faster resiliparse extractor, falling back to trafilatura when
+    USE_TRAFILATURA is set or resiliparse finds too little main content.
+    """
+    if not USE_TRAFILATURA:
+        tree = HTMLTree.parse(html)
+        text = extract_plain_text(tree, main_content=True, preserve_formatting=True)
+        if len(text) >= RESILIPARSE_MIN_CHARS:
+            return {"title": tree.title or "Untitled", "text": text}
+        print("[Extract] resiliparse found little main content, falling back to trafilatura.")
+
     extracted = trafilatura.extract(html, with_metadata=True, output_format="json")
     if not extracted:
         raise ValueError("Failed to extract readable content from HTML.")
-    return json.loads(extracted)
+    # Same shape as the resiliparse path, whichever extractor produced it
+    data = json.loads(extracted)
+    return {"title": data.get("title") or "Untitled", "text": data.get("text") or ""}
 
 
 async def get_article_from_dynamic_site(url: str) -> dict:
@@ -1,49 +1,195 @@
 import asyncio
-import requests
-from bs4 import BeautifulSoup
+import re
+import aiohttp
 from urllib.parse import urlparse
-from playwright.async_api import async_playwright
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 from playwright_stealth import stealth_async
+from utils.async_cache import AsyncCache
 
-def fetch_with_googlebot(url: str) -> str:
+# A single headless browser is launched on first use and shared by all fetches;
+# each fetch only opens (and closes) its own page.
+_playwright = None
+_browser = None
+_context = None
+_browser_lock = asyncio.Lock()
+
+
+async def _get_browser_context():
+    global _playwright, _browser, _context
+    async with _browser_lock:
+        if _browser is not None and not _browser.is_connected():
+            # Chromium crashed or was closed underneath us; start over with a fresh one
+            print("[Browser] Shared browser disconnected, relaunching")
+            await _stop_browser()
+        if _context is None:
+            if _playwright is None:
+                _playwright = await async_playwright().start()
+            if _browser is None:
+                _browser = await _playwright.chromium.launch(headless=True)
+            _context = await _browser.new_context()
+            _context.on("close", _forget_context)
+        return _context
+
+
+def _forget_context(context):
+    # A closed context cannot open pages; the next fetch creates a new one
+    global _context
+    if _context is context:
+        _context = None
+
+
+async def _stop_browser():
+    """Close the shared browser and Playwright; the caller holds _browser_lock."""
+    global _playwright, _browser, _context
+    browser, playwright = _browser, _playwright
+    _playwright = _browser = _context = None
+    # Either may already be dead after a crash, which is why we are here
+    if browser is not None:
+        try:
+            await browser.close()
+        except Exception as e:
+            print(f"[Browser] Error closing browser: {e}")
+    if playwright is not None:
+        try:
+            await playwright.stop()
+        except Exception as e:
+            print(f"[Browser] Error stopping Playwright: {e}")
+
+
+# The plain-fetch check only needs to know whether the tag exists; the article
+# extractors parse the page afterwards, so a full parse here would be wasted
+_NEXT_DATA_RE = re.compile(r"""<script\b[^>]*\sid\s*=\s*["']?__NEXT_DATA__["'\s>]""", re.IGNORECASE)
+
+_STRIP_NON_CONTENT_JS = """
+() => document
+    .querySelectorAll('script:not([type="application/ld+json"]), style, svg, link[rel="stylesheet"]')
+    .forEach((el) => el.remove())
+"""
+
+GOOGLEBOT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)"
+}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_FETCH_ATTEMPTS = 3
+
+# Pooled HTTP session shared by all Googlebot fetches, created on first use
+_session = None
+
+# Recently fetched pages: url -> (html, validators)
+CACHE_TTL = 900
+CACHE_MAX_ENTRIES = 512
+_pages = AsyncCache(CACHE_MAX_ENTRIES, ttl=CACHE_TTL)
+
+
+def _get_session() -> aiohttp.ClientSession:
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=1024, limit_per_host=64),
+            timeout=aiohttp.ClientTimeout(total=15)
+        )
+    return _session
+
+
+def _retry_delay(response: aiohttp.ClientResponse, attempt: int) -> float:
+    retry_after = response.headers.get("Retry-After", "")
+    if retry_after.isdigit():
+        return min(float(retry_after), 30.0)
+    return float(2 ** attempt)
+
+
+async def fetch_with_googlebot(url: str, extra_headers: dict = None) -> tuple[int, str, dict]:
+    """Fetch a page with Googlebot headers.
+
+    Returns:
+        The final status code, the page text and the validators (ETag /
+        Last-Modified) to send with a later conditional request.
+    """
     print(f"[Fallback] Fetching with Googlebot headers: {url}")
-    headers = {
-        "User-Agent": "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)"
-    }
-    response = requests.get(url, headers=headers, timeout=15)
-    response.encoding = response.apparent_encoding
-    return response.text
+    headers = {**GOOGLEBOT_HEADERS, **(extra_headers or {})}
+    session = _get_session()
+    for attempt in range(MAX_FETCH_ATTEMPTS):
+        async with session.get(url, headers=headers) as response:
+            if response.status in RETRY_STATUSES and attempt < MAX_FETCH_ATTEMPTS - 1:
+                delay = _retry_delay(response, attempt)
+                print(f"[Fallback] {url} returned {response.status}, retrying in {delay:.0f}s")
+            else:
+                validators = {}
+                if "ETag" in response.headers:
+                    validators["If-None-Match"] = response.headers["ETag"]
+                if "Last-Modified" in response.headers:
+                    validators["If-Modified-Since"] = response.headers["Last-Modified"]
+                # Uses the charset from Content-Type, falling back to UTF-8
+                return response.status, await response.text(errors="replace"), validators
+        await asyncio.sleep(delay)
+
 
 async def fetch_content(url: str) -> str:
-    # 🔍 Try using requests + Googlebot to get around light anti-bot walls
+    """Fetch a page's HTML, serving repeat requests from a short-lived cache.
+
+    Concurrent requests for the same URL share a single fetch.
+    """
     if not urlparse(url).scheme:
      url = "https://" + url
+
+    html, _ = await _pages.get_or_create(url, lambda: _fetch_uncached(url, _pages.get(url, allow_stale=True)))
+    return html
+
+
+async def _fetch_uncached(url: str, cached: tuple = None) -> tuple[str, dict]:
+    # 🔍 Try a plain HTTP fetch with Googlebot headers to get around light anti-bot walls
     try:
-        html = await asyncio.to_thread(fetch_with_googlebot, url)
-        soup = BeautifulSoup(html, "html.parser")
+        # A stale entry from a plain fetch can be revalidated instead of downloaded again
+        stale_validators = cached[1] if cached else {}
+        status, html, validators = await fetch_with_googlebot(url, stale_validators)
+        if status == 304 and stale_validators:
+            print("[Smart Fetch] Page not modified, reusing cached copy.")
+            return cached[0], stale_validators
 
-        if soup.find("script", {"id": "__NEXT_DATA__"}):
-            print("[Smart Fetch] Found __NEXT_DATA__ in requests version, skipping Playwright.")
-            return html
+        if _NEXT_DATA_RE.search(html):
+            print("[Smart Fetch] Found __NEXT_DATA__ in plain fetch, skipping Playwright.")
+            return html, validators
         else:
-            print("[Smart Fetch] No __NEXT_DATA__ found in initial requests response.")
+            print("[Smart Fetch] No __NEXT_DATA__ found in initial plain fetch.")
     except Exception as e:
-        print(f"[Smart Fetch] Initial requests check failed: {e}")
+        print(f"[Smart Fetch] Initial plain fetch failed: {e}")
 
     # ⏳ Fallback to Playwright for dynamic content or heavy JS sites
+    return await _fetch_with_playwright(url), {}
+
+
+async def _fetch_with_playwright(url: str) -> str:
     print(f"[Playwright] Navigating to {url}")
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context()
-        page = await context.new_page()
+    context = await _get_browser_context()
+    page = await context.new_page()
+    try:
         await stealth_async(page)
 
         await page.goto(url, timeout=60000)
-        await page.wait_for_load_state("networkidle")
-        await asyncio.sleep(3)
-        await page.evaluate("window.scrollBy(0, document.body.scrollHeight)")
-        await asyncio.sleep(2)
-
-        content = await page.content()
-        await browser.close()
-        return content
+        await page.wait_for_load_state("domcontentloaded")
+        try:
+            # Content landmarks usually exist as soon as the page is usable
+            await page.wait_for_selector("script#__NEXT_DATA__, article, main", state="attached", timeout=5000)
+        except PlaywrightTimeoutError:
+            # Nothing yet: trigger lazy loading and give the network a bounded moment to settle
+            await page.evaluate("window.scrollBy(0, document.body.scrollHeight)")
+            try:
+                await page.wait_for_load_state("networkidle", timeout=5000)
+            except PlaywrightTimeoutError:
+                print(f"[Playwright] Network still busy after scroll, using current content: {url}")
+
+        # Script bundles, styles and inline SVG are often most of an SPA's markup and no
+        # extractor reads them; drop them in the page so they never reach Python.
+        # JSON-LD stays because trafilatura pulls metadata from it.
+        await page.evaluate(_STRIP_NON_CONTENT_JS)
+        return await page.content()
+    finally:
+        await page.close()
+
+
+async def shutdown():
+    """Close the shared HTTP session and Playwright browser, if they were started."""
+    if _session is not None and not _session.closed:
+        await _session.close()
+    async with _browser_lock:
+        await _stop_browser()
@@ -1,13 +1,46 @@
 import os
-import httpx
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
 import asyncio
-import tiktoken
+from functools import lru_cache
+import orjson
 from utils.discord_utils import fix_discord_formatting
+from utils.async_cache import AsyncCache
+from utils.http import get_client
 
-DEEPSEEK_API_URL = "https://api.deepseek.com/v1/chat/completions"
-MODEL_NAME = "deepseek-chat"
+# Overridable so summaries can be served by any OpenAI-compatible endpoint (e.g. a self-hosted, quantized model)
+DEEPSEEK_API_URL = os.getenv("DEEPSEEK_API_URL", "https://api.deepseek.com/v1/chat/completions")
+MODEL_NAME = os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
 
+logger = logging.getLogger(__name__)
+
+_HEADERS = {
+    "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
+    "Content-Type": "application/json"
+}
+# Only created if the optional GPT formatting pass is used
+_openai_client = None
+
+# Finished summaries are kept on disk so retries and repeat requests skip the LLM call
+SUMMARY_CACHE_PATH = os.getenv("SUMMARY_CACHE_PATH", os.path.join("storage", "summaries.db"))
+# Stored summaries older than this are pruned when the database is opened
+SUMMARY_CACHE_MAX_AGE = 30 * 24 * 3600
+_cache_db = None
+# Database calls run in worker threads; one connection is shared, one call at a time
+_cache_db_lock = threading.Lock()
+# Recent summaries also stay in memory, so repeat requests skip the database too
+SUMMARY_MEMORY_ENTRIES = 256
+_summaries = AsyncCache(SUMMARY_MEMORY_ENTRIES)
+
+# Both bullet fixes rewrite a line prefix to "-", so one alternation covers them:
+# "-*text**" is a bullet the model glued to bold markup; "*", "+" and "•" bullets become "-"
+_BULLET_FIX_RE = re.compile(r"^(?:-\*(?=\*|.*\*\*)|[*+•][^\S\n]*)", re.MULTILINE)
+
 SUMMARY_INSTRUCTIONS = {
     "tl;dr": "Write a 1–2 sentence summary of this article's core idea. No formatting.",
     "default": (
@@ -27,38 +60,35 @@ def clean_discord_markdown(text):
     This function applies specific summarizer-related fixes and then uses
     the more comprehensive fix_discord_formatting function.
     """
-    lines = text.splitlines()
-    cleaned = []
-    last_was_parent_bullet = False
+    text = "\n".join(line.strip() for line in text.splitlines())
 
-    for line in lines:
-        stripped = line.strip()
+    # Fix malformed bullets and normalize bullets in a single regex pass
+    text = _BULLET_FIX_RE.sub("-", text)
 
-        # Fix malformed bullets
-        if stripped.startswith("-*") and "**" in stripped:
-            stripped = "-" + stripped[2:]
-
-        # Normalize bullets
-        if stripped.startswith(("*", "+", "•")):
-            stripped = "-" + stripped[1:].lstrip()
-
-        # Auto-indent child lines if the last line was a bullet ending in ":"
-        if not stripped.startswith("-") and last_was_parent_bullet:
-            stripped = f"  - {stripped}"
-
-        last_was_parent_bullet = stripped.startswith("-") and stripped.endswith(":")
-        cleaned.append(stripped)
-
-    summary_specific_fixes = "\n".join(cleaned)
+    # Auto-indent child lines if the last line was a bullet ending in ":".
+    # Only a colon followed by another line can start a child, so most summaries skip the loop.
+    if ":\n" in text:
+        cleaned = []
+        last_was_parent_bullet = False
+        for line in text.split("\n"):
+            is_bullet = line[:1] == "-"
+            if last_was_parent_bullet and not is_bullet:
+                line = f"  - {line}"
+            cleaned.append(line)
+            last_was_parent_bullet = is_bullet and line[-1:] == ":"
+        text = "\n".join(cleaned)
     
     # Apply general Discord markdown fixes
-    return fix_discord_formatting(summary_specific_fixes)
+    return fix_discord_formatting(text)
 
 async def format_summary_with_chatgpt(summary_text: str) -> str:
-    import openai
-    openai.api_key = os.getenv("OPENAI_API_KEY")
-    if not openai.api_key:
-        raise ValueError("Missing OPENAI_API_KEY")
+    global _openai_client
+    if _openai_client is None:
+        from openai import AsyncOpenAI
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("Missing OPENAI_API_KEY")
+        _openai_client = AsyncOpenAI(api_key=api_key)
 
     SYSTEM_PROMPT = (
         "You will receive a raw article summary. Format it using Discord-compatible markdown:\n"
@@ -80,7 +110,7 @@ async def format_summary_with_chatgpt(summary_text: str) -> str:
         "- Don't mention these instructions in your output"
     )
 
-    response = await openai.ChatCompletion.acreate(
+    response = await _openai_client.chat.completions.create(
         model="gpt-4o-mini",
         messages=[
             {"role": "system", "content": SYSTEM_PROMPT},
@@ -89,12 +119,79 @@ async def format_summary_with_chatgpt(summary_text: str) -> str:
         temperature=0.3,
     )
 
-    return response.choices[0].message["content"].strip()
+    return response.choices[0].message.content.strip()
+
+@lru_cache(maxsize=None)
+def _encoder():
+    # Loading the BPE tables is costly (and may download them), so it only happens when debug logging needs it
+    import tiktoken
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def _get_cache_db() -> sqlite3.Connection:
+    global _cache_db
+    if _cache_db is None:
+        os.makedirs(os.path.dirname(SUMMARY_CACHE_PATH) or ".", exist_ok=True)
+        db = sqlite3.connect(SUMMARY_CACHE_PATH, check_same_thread=False)
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS summaries (key TEXT PRIMARY KEY, summary TEXT NOT NULL, ts INTEGER NOT NULL)"
+        )
+        db.execute("DELETE FROM summaries WHERE ts < ?", (int(time.time()) - SUMMARY_CACHE_MAX_AGE,))
+        db.commit()
+        _cache_db = db
+    return _cache_db
+
+
+def _summary_cache_key(text: str, summary_type: str, max_final_chars: int) -> str:
+    digest = hashlib.sha256(text.encode()).hexdigest()[:16]
+    return f"{digest}|{summary_type}|{max_final_chars}"
+
+
+def _load_stored_summary(key: str):
+    with _cache_db_lock:
+        row = _get_cache_db().execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def _store_cached_summary(key: str, summary: str):
+    with _cache_db_lock:
+        db = _get_cache_db()
+        db.execute(
+            "INSERT OR REPLACE INTO summaries (key, summary, ts) VALUES (?, ?, ?)",
+            (key, summary, int(time.time()))
+        )
+        db.commit()
+
 
 async def summarize_article_full(text, summary_type="default", max_final_chars=1800, title="Untitled", url="example.com"):
-    enc = tiktoken.get_encoding("cl100k_base")
-    token_count = len(enc.encode(text))
-    print(f"[Token Count] Input estimated at {token_count} tokens")
+    key = _summary_cache_key(text.strip(), summary_type, max_final_chars)
+    formatted = await _summaries.get_or_create(
+        key, lambda: _load_or_generate_summary(key, text, summary_type, max_final_chars)
+    )
+
+    if formatted is None:
+        return "❌ Summary failed using DeepSeek."
+    return f"📝 **[{title}]({url})**\n\n{formatted}"
+
+
+async def _load_or_generate_summary(key, text, summary_type, max_final_chars):
+    # Off the event loop: the database may be locked by another process or on slow storage
+    try:
+        formatted = await asyncio.to_thread(_load_stored_summary, key)
+    except (sqlite3.Error, OSError) as e:
+        print(f"[Summary Cache] Could not read cached summary: {e}")
+        formatted = None
+    if formatted is not None:
+        print("[Summary Cache] Hit, skipping DeepSeek call.")
+        return formatted
+    return await _generate_summary(key, text, summary_type, max_final_chars)
+
+
+async def _generate_summary(key, text, summary_type, max_final_chars):
+    """Call DeepSeek and cache the cleaned summary body; returns None on failure."""
+    # A full BPE pass over a long article is only worth it when someone reads the number
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"[Token Count] Input is {len(_encoder().encode_ordinary(text))} tokens")
 
     system_prompt = (
         f"You are a helpful summarization assistant for a Discord bot. "
@@ -119,33 +216,58 @@ async def summarize_article_full(text, summary_type="default", max_final_chars=1
         "model": MODEL_NAME,
         "messages": messages,
         "temperature": 0.7,
-        "max_tokens": 1000
-    }
-
-    headers = {
-        "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
-        "Content-Type": "application/json"
+        "max_tokens": 1000,
+        "stream": True
     }
 
     try:
-        timeout = httpx.Timeout(60.0, connect=10.0)
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(DEEPSEEK_API_URL, headers=headers, json=body)
-            response.raise_for_status()
-            result = response.json()["choices"][0]["message"]["content"].strip()
-            print(f"[Summary Length] {len(result)} characters")
-
-            cleaned = clean_discord_markdown(result)
+        result = await _stream_completion(body)
+        print(f"[Summary Length] {len(result)} characters")
 
-            USE_GPT_FORMATTER = False
-            if USE_GPT_FORMATTER:
-                formatted = await format_summary_with_chatgpt(cleaned)
-            else:
-                formatted = cleaned
+        cleaned = clean_discord_markdown(result)
 
-            return f"📝 **[{title}]({url})**\n\n{formatted}"
+        USE_GPT_FORMATTER = False
+        if USE_GPT_FORMATTER:
+            formatted = await format_summary_with_chatgpt(cleaned)
+        else:
+            formatted = cleaned
 
     except Exception as e:
         import traceback
         print("[ERROR] summarize_article_full failed:", traceback.format_exc())
-        return "❌ Summary failed using DeepSeek."
+        return None
+
+    # Failures are never cached, so the next request retries
+    try:
+        await asyncio.to_thread(_store_cached_summary, key, formatted)
+    except (sqlite3.Error, OSError) as e:
+        print(f"[Summary Cache] Could not store summary: {e}")
+    return formatted
+
+
+async def _stream_completion(body: dict) -> str:
+    """POST a streaming chat completion and return the assembled message text.
+
+    Deltas are parsed from the server-sent events as they arrive, so the
+    response is never buffered as one large JSON document.
+    """
+    parts = []
+    # Pre-serialized with orjson; the Content-Type header is already in _HEADERS
+    async with get_client().stream("POST", DEEPSEEK_API_URL, headers=_HEADERS, content=orjson.dumps(body)) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue  # blank separators and ": keep-alive" comments
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            delta = orjson.loads(data)["choices"][0].get("delta", {}).get("content")
+            if delta:
+                parts.append(delta)
+    return "".join(parts).strip()
+
+
+async def aclose_clients():
+    """Close the summarizer's own API clients; call once on bot shutdown."""
+    if _openai_client is not None:
+        await _openai_client.close()
@@ -0,0 +1,38 @@
+import asyncio
+
+from utils.async_cache import AsyncCache
+
+
+def test_get_or_create_shares_misses_evicts_and_expires():
+    async def run():
+        calls = []
+
+        async def create(key):
+            calls.append(key)
+            await asyncio.sleep(0)
+            return None if key == "fail" else key.upper()
+
+        cache = AsyncCache(max_entries=2)
+        # Concurrent misses share one call, and later hits skip it entirely
+        assert await asyncio.gather(*(cache.get_or_create("a", lambda: create("a")) for _ in range(3))) == ["A"] * 3
+        assert await cache.get_or_create("a", lambda: create("a")) == "A"
+        assert calls == ["a"]
+
+        # None is not cached, so a failure is retried
+        assert await cache.get_or_create("fail", lambda: create("fail")) is None
+        assert await cache.get_or_create("fail", lambda: create("fail")) is None
+        assert calls.count("fail") == 2
+
+        # The least recently used entry is evicted
+        await cache.get_or_create("b", lambda: create("b"))
+        cache.get("a")
+        await cache.get_or_create("c", lambda: create("c"))
+        assert cache.get("b") is None
+        assert cache.get("a") == "A"
+
+        expiring = AsyncCache(max_entries=2, ttl=0)
+        expiring.set("x", 1)
+        assert expiring.get("x") is None
+        assert expiring.get("x", allow_stale=True) == 1
+
+    asyncio.run(run())
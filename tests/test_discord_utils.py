@@ -0,0 +1,51 @@
+import asyncio
+
+import discord
+
+from utils.discord_utils import fix_discord_formatting, send_discord_safe
+
+
+class FakeMessage(discord.Message):
+    def __init__(self):
+        self.sent = []
+
+    async def reply(self, content):
+        self.sent.append(content)
+
+
+def send(text: str) -> list[str]:
+    message = FakeMessage()
+    asyncio.run(send_discord_safe(message, text))
+    return message.sent
+
+
+def test_padded_paragraph_that_fits_once_stripped_is_not_split():
+    paragraph = "b" * 1998
+    assert send("     " + paragraph + "  \n ") == [paragraph]
+
+
+def test_padded_paragraph_after_code_starts_its_own_message():
+    head = "a" * 1500 + "\n```py\nx\n```"
+    paragraph = "b" * 1999
+    assert send(head + "\n   " + paragraph + "   ") == [head, paragraph]
+
+
+def test_paragraph_over_the_limit_is_split_at_line_breaks():
+    first, second = "c" * 1500, "d" * 1500
+    assert send(first + "\n" + second) == [first, second]
+
+
+def test_fix_discord_formatting_matches_the_separate_passes():
+    cases = {
+        "#### Header": "**Header**",
+        "##Header": "## Header",
+        "****text****": "***text***",
+        "___text___": "__text__",
+        "~~~text~~~": "~~text~~",
+        "#### ****x****": "***x***",
+        "****a ___b___ c****": "***a __b__ c***",
+        # An inline run must not swallow the header on the next line
+        "####___Title___ ___Title______word___\n#### x**Title**": "####__Title__ __Title__word___\n**x**Title****",
+    }
+    for text, expected in cases.items():
+        assert fix_discord_formatting(text) == expected
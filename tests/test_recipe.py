@@ -0,0 +1,21 @@
+from utils.recipe import detect_recipe_from_text
+
+
+def test_bold_headers_are_not_items():
+    recipe = detect_recipe_from_text("**Ingredients:**\na\nb\n**Instructions:**\nmix")
+    assert recipe["ingredients"] == ["a", "b"]
+    assert recipe["instructions"] == ["mix"]
+
+
+def test_bold_header_with_colon_outside_and_inline_item():
+    recipe = detect_recipe_from_text("**Ingredients**: flour\neggs\n__Instructions:__ whisk")
+    assert recipe["ingredients"] == ["flour", "eggs"]
+    assert recipe["instructions"] == ["whisk"]
+
+
+def test_prep_header_ends_ingredients_without_opening_instructions():
+    recipe = detect_recipe_from_text(
+        "Pasta\nIngredients:\nnoodles\nPreparation: 10 minutes\nDirections:\nsimmer\nNotes:\nserve hot"
+    )
+    assert recipe["ingredients"] == ["noodles"]
+    assert recipe["instructions"] == ["simmer"]
@@ -52,10 +52,19 @@ BG_SOL_MAGENTA = "\u001b[0;45m"
 # ───────────────────────────────────────────────
 # 🧪 Sample Combinations
 # ───────────────────────────────────────────────
-BULLET         = f"{SOL_GREEN}•{RESET}"
-BULLET_SUB     = f"{BASE0}→{RESET}"
+# Pre-composed literals: no formatting work at import or per render
+BULLET         = "\u001b[1;32m•\u001b[0m"   # SOL_GREEN • RESET
+BULLET_SUB     = "\u001b[0;34m→\u001b[0m"   # BASE0 → RESET
 TITLE_COLOR    = SOL_CYAN
 HEADER_COLOR   = SOL_YELLOW
 QUOTE_COLOR    = SOL_MAGENTA
 TEXT_COLOR     = BASE1
 
+# ───────────────────────────────────────────────
+# 📇 Lookup Table
+# ───────────────────────────────────────────────
+# Every code above by name, for callers that pick colors dynamically
+COLORS: dict[str, str] = {
+    name: value for name, value in globals().items()
+    if name.isupper() and isinstance(value, str)
+}
@@ -0,0 +1,63 @@
+# utils/async_cache.py
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class AsyncCache:
+    """In-memory LRU cache whose misses share one in-flight computation per key.
+
+    Entries older than ``ttl`` seconds (if given) count as misses, and the
+    least recently used entry is dropped once ``max_entries`` is exceeded.
+    """
+
+    def __init__(self, max_entries: int, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    def get(self, key: Hashable, allow_stale: bool = False):
+        """Return the cached value for key, or None if it is missing or expired.
+
+        With allow_stale, an expired entry is still returned (e.g. for revalidation).
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if not allow_stale and self.ttl is not None and time.monotonic() - entry[0] >= self.ttl:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_create(self, key: Hashable, create: Callable[[], Awaitable[Any]]):
+        """Return the cached value for key, awaiting create() on a miss.
+
+        Concurrent misses for the same key share a single create() call. A
+        result of None is returned but not cached, so failures are retried.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._create_and_store(key, create))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded so one caller giving up does not cancel the work for the others
+        return await asyncio.shield(task)
+
+    async def _create_and_store(self, key: Hashable, create: Callable[[], Awaitable[Any]]):
+        value = await create()
+        if value is not None:
+            self.set(key, value)
+        return value
@@ -1,11 +1,26 @@
-import json
 import os
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 import logging
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, field
 import asyncio
-import openai
+from collections import OrderedDict
+import aiofiles
+import aiofiles.os
+from openai import AsyncOpenAI
+import orjson
+
+# Seconds to wait after a change before writing dirty conversations to disk
+FLUSH_DELAY = 1.0
+
+# Files are written compact; set CONVERSATION_PRETTY_JSON=1 to get readable files while debugging
+_DUMP_OPTIONS = orjson.OPT_INDENT_2 if os.getenv("CONVERSATION_PRETTY_JSON") == "1" else 0
+
+# The message log is rewritten once it holds this many times max_history lines
+COMPACT_FACTOR = 2
+
+# Conversations kept in memory; the least recently used ones already on disk are dropped beyond this
+CACHE_MAX_ENTRIES = 256
 
 @dataclass
 class Message:
@@ -21,6 +36,8 @@ class Conversation:
     metadata: Dict[str, Any]
     created_at: str
     updated_at: str
+    # Request-ready {"role", "content"} dicts kept in step with messages; never persisted
+    openai_messages: List[Dict[str, str]] = field(default_factory=list, repr=False)
 
 class ConversationManager:
     def __init__(self, settings_dir: str) -> None:
@@ -29,6 +46,18 @@ class ConversationManager:
         self.logger = logging.getLogger(__name__)
         os.makedirs(self.conversations_dir, exist_ok=True)
 
+        # Conversations are served from memory and written back in batches
+        self._cache: "OrderedDict[str, Conversation]" = OrderedDict()
+        self._dirty: set = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        # On disk each conversation is an append-only message log plus a small metadata file;
+        # _pending holds messages not yet appended, _log_lines the lines already in each log
+        self._pending: Dict[str, List[Message]] = {}
+        self._log_lines: Dict[str, int] = {}
+        self._legacy: set = set()
+        # Writes and resets of one conversation never interleave
+        self._locks: Dict[str, asyncio.Lock] = {}
+
         self.default_settings = {
             "max_history": 10,
             "auto_summarize": False,
@@ -44,12 +73,24 @@ class ConversationManager:
             self.logger.error("OPENAI_API_KEY not found in environment variables")
             raise ValueError("OPENAI_API_KEY not found in environment variables")
 
-        openai.api_key = api_key
+        # The async client pools connections across requests
+        self.client = AsyncOpenAI(api_key=api_key)
         self.logger.info("OpenAI client initialized successfully")
 
+    def _conversation_path(self, conversation_id: str) -> str:
+        """Path of the old single-file format, read only to migrate it."""
+        return os.path.join(self.conversations_dir, f"{conversation_id}.json")
+
+    def _messages_path(self, conversation_id: str) -> str:
+        return os.path.join(self.conversations_dir, f"{conversation_id}.messages.jsonl")
+
+    def _meta_path(self, conversation_id: str) -> str:
+        return os.path.join(self.conversations_dir, f"{conversation_id}.meta.json")
+
     async def create_conversation(self, conversation_id: str, settings: Optional[Dict[str, Any]] = None) -> Conversation:
         settings = settings or {}
         conversation_settings = {**self.default_settings, **settings}
+        now_iso = datetime.now().isoformat()
 
         conversation = Conversation(
             messages=[],
@@ -60,35 +101,75 @@ class ConversationManager:
                 "sentiment": None,
                 "participants": set()
             },
-            created_at=datetime.now().isoformat(),
-            updated_at=datetime.now().isoformat()
+            created_at=now_iso,
+            updated_at=now_iso
         )
 
         await self._save_conversation(conversation_id, conversation)
         return conversation
 
     async def get_conversation(self, user_id: str, channel_id: str) -> Optional[Conversation]:
+        conversation_id = f"{user_id}_{channel_id}"
+        cached = self._cache.get(conversation_id)
+        if cached is not None:
+            self._cache.move_to_end(conversation_id)
+            return cached
         try:
-            import aiofiles
-            conversation_id = f"{user_id}_{channel_id}"
-            file_path = os.path.join(self.conversations_dir, f"{conversation_id}.json")
-            if not os.path.exists(file_path):
-                return None
-
-            async with aiofiles.open(file_path, "r", encoding="utf-8") as f:
-                data = json.loads(await f.read())
-                return self._deserialize_conversation(data)
+            conversation = await self._load_conversation(conversation_id)
         except Exception as e:
             self.logger.error(f"Error getting conversation for user {user_id} in channel {channel_id}: {e}", exc_info=True)
             return None
+        if conversation is not None:
+            self._cache[conversation_id] = conversation
+            self._evict()
+        return conversation
+
+    async def _load_conversation(self, conversation_id: str) -> Optional[Conversation]:
+        try:
+            # orjson parses the raw bytes, so there is no separate UTF-8 decode pass
+            async with aiofiles.open(self._meta_path(conversation_id), "rb") as f:
+                meta = orjson.loads(await f.read())
+        except FileNotFoundError:
+            return await self._load_legacy_conversation(conversation_id)
+
+        try:
+            async with aiofiles.open(self._messages_path(conversation_id), "rb") as f:
+                lines = (await f.read()).splitlines()
+        except FileNotFoundError:
+            lines = []
+        messages = []
+        for line in lines:
+            try:
+                messages.append(Message(**orjson.loads(line)))
+            except orjson.JSONDecodeError:
+                # A crash mid-append can leave a torn last line
+                self.logger.warning(f"Skipping unreadable message line in conversation {conversation_id}")
+        self._log_lines[conversation_id] = len(lines)
+        return self._deserialize_conversation(meta, messages)
+
+    async def _load_legacy_conversation(self, conversation_id: str) -> Optional[Conversation]:
+        """Read a conversation saved as one JSON file and queue it for rewriting in the new format."""
+        try:
+            async with aiofiles.open(self._conversation_path(conversation_id), "rb") as f:
+                data = orjson.loads(await f.read())
+        except FileNotFoundError:
+            return None
+        conversation = self._deserialize_conversation(data, [Message(**msg) for msg in data["messages"]])
+        self._legacy.add(conversation_id)
+        self._pending[conversation_id] = list(conversation.messages)
+        self._log_lines[conversation_id] = 0
+        await self._save_conversation(conversation_id, conversation)
+        return conversation
 
     async def add_message(self, user_id: str, channel_id: str, content: str, role: str = "user", conversation: Optional[Conversation] = None, system_prompt: Optional[str] = None) -> Optional[Conversation]:
         try:
             conversation_id = f"{user_id}_{channel_id}"
+            # One timestamp for everything this turn touches
+            now_iso = datetime.now().isoformat()
             message = Message(
                 role=role,
                 content=content,
-                timestamp=datetime.now().isoformat(),
+                timestamp=now_iso,
                 metadata={
                     "user_id": user_id,
                     "channel_id": channel_id,
@@ -108,8 +189,8 @@ class ConversationManager:
                             "sentiment": None,
                             "participants": set()
                         },
-                        created_at=datetime.now().isoformat(),
-                        updated_at=datetime.now().isoformat()
+                        created_at=now_iso,
+                        updated_at=now_iso
                     )
 
             if "participants" not in conversation.metadata:
@@ -119,9 +200,9 @@ class ConversationManager:
             if system_prompt:
                 conversation.metadata["settings"]["system_prompt"] = system_prompt
 
-            conversation.messages.append(message)
+            self._append_message(conversation_id, conversation, message)
             conversation.metadata["participants"].add(role)
-            conversation.updated_at = datetime.now().isoformat()
+            conversation.updated_at = now_iso
             await self._save_conversation(conversation_id, conversation)
             return conversation
         except Exception as e:
@@ -138,27 +219,30 @@ class ConversationManager:
             if "participants" not in conversation.metadata:
                 conversation.metadata["participants"] = set()
 
+            now_iso = datetime.now().isoformat()
             user_message = Message(
                 role="user",
                 content=message,
-                timestamp=datetime.now().isoformat(),
+                timestamp=now_iso,
                 metadata={}
             )
-            conversation.messages.append(user_message)
+            self._append_message(f"{user_id}_{channel_id}", conversation, user_message)
             conversation.metadata["participants"].add("user")
-            conversation.updated_at = datetime.now().isoformat()
+            conversation.updated_at = now_iso
 
             response_text = await self._generate_ai_response(conversation)
 
+            # The reply arrives later, so it gets its own timestamp
+            now_iso = datetime.now().isoformat()
             ai_message = Message(
                 role="assistant",
                 content=response_text,
-                timestamp=datetime.now().isoformat(),
+                timestamp=now_iso,
                 metadata={}
             )
-            conversation.messages.append(ai_message)
+            self._append_message(f"{user_id}_{channel_id}", conversation, ai_message)
             conversation.metadata["participants"].add("assistant")
-            conversation.updated_at = datetime.now().isoformat()
+            conversation.updated_at = now_iso
 
             await self._save_conversation(f"{user_id}_{channel_id}", conversation)
             return response_text
@@ -166,22 +250,37 @@ class ConversationManager:
             self.logger.error(f"Error generating response for user {user_id} in channel {channel_id}: {e}", exc_info=True)
             return None
 
+    def _max_history(self, conversation: Conversation) -> int:
+        settings = conversation.metadata.get("settings", self.default_settings)
+        return settings.get("max_history", self.default_settings["max_history"])
+
+    def _append_message(self, conversation_id: str, conversation: Conversation, message: Message):
+        """Append a message, dropping the oldest ones beyond the max_history setting."""
+        conversation.messages.append(message)
+        conversation.openai_messages.append({"role": message.role, "content": message.content})
+        self._pending.setdefault(conversation_id, []).append(message)
+        self._trim_history(conversation)
+
+    def _trim_history(self, conversation: Conversation):
+        max_history = self._max_history(conversation)
+        if len(conversation.messages) > max_history:
+            del conversation.messages[:-max_history]
+            del conversation.openai_messages[:-max_history]
+
     async def _generate_ai_response(self, conversation: Conversation) -> str:
         try:
-            recent_messages = conversation.messages[-5:]
-            messages = []
-            
-            # Add system prompt if available
             settings = conversation.metadata.get("settings", self.default_settings)
+            # Already trimmed to max_history, so the whole list is the request window
+            recent_messages = conversation.openai_messages
+
+            # Add system prompt if available
             system_prompt = settings.get("system_prompt")
             if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-            
-            # Add conversation messages
-            messages.extend([{"role": msg.role, "content": msg.content} for msg in recent_messages])
+                messages = [{"role": "system", "content": system_prompt}, *recent_messages]
+            else:
+                messages = recent_messages
 
-            response = await asyncio.to_thread(
-                openai.ChatCompletion.create,
+            response = await self.client.chat.completions.create(
                 model=settings.get("model", "gpt-4o-mini"),
                 messages=messages,
                 temperature=settings.get("temperature", 0.7),
@@ -193,20 +292,88 @@ class ConversationManager:
             return "I'm sorry, I encountered an error while generating a response."
 
     async def _save_conversation(self, conversation_id: str, conversation: Conversation):
+        """Record the conversation as changed; it is written to disk shortly after."""
+        self._cache[conversation_id] = conversation
+        self._cache.move_to_end(conversation_id)
+        self._dirty.add(conversation_id)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        # Debounce: every change within the delay goes out in one batch
+        await asyncio.sleep(FLUSH_DELAY)
+        await self.flush()
+        # Saves made while writing, and failed writes, only marked ids dirty; go again for them
+        self._flush_task = None
+        if self._dirty:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def flush(self):
+        """Write all changed conversations to disk; call once more on shutdown."""
+        dirty, self._dirty = self._dirty, set()
+        await asyncio.gather(*(self._write_conversation(conversation_id) for conversation_id in dirty))
+        self._evict()
+
+    def _evict(self):
+        """Drop the least recently used conversations beyond CACHE_MAX_ENTRIES that are safely on disk."""
+        excess = len(self._cache) - CACHE_MAX_ENTRIES
+        for conversation_id in list(self._cache):
+            if excess <= 0:
+                break
+            lock = self._locks.get(conversation_id)
+            if conversation_id in self._dirty or conversation_id in self._pending or (lock and lock.locked()):
+                continue
+            del self._cache[conversation_id]
+            self._log_lines.pop(conversation_id, None)
+            self._locks.pop(conversation_id, None)
+            excess -= 1
+
+    async def _write_conversation(self, conversation_id: str):
+        async with self._locks.setdefault(conversation_id, asyncio.Lock()):
+            await self._write_conversation_locked(conversation_id)
+
+    async def _write_conversation_locked(self, conversation_id: str):
+        conversation = self._cache.get(conversation_id)
+        if conversation is None:
+            return  # Reset before the flush ran
+        pending = self._pending.pop(conversation_id, [])
         try:
-            import aiofiles
-            file_path = os.path.join(self.conversations_dir, f"{conversation_id}.json")
-            os.makedirs(self.conversations_dir, exist_ok=True)
-            data = self._serialize_conversation(conversation)
-            async with aiofiles.open(file_path, "w", encoding="utf-8") as f:
-                await f.write(json.dumps(data, indent=2))
+            log_lines = self._log_lines.get(conversation_id, 0) + len(pending)
+            if log_lines > COMPACT_FACTOR * self._max_history(conversation):
+                # Trimmed messages are still in the log; rewrite it with just the kept ones
+                data = b"".join(orjson.dumps(msg) + b"\n" for msg in conversation.messages)
+                await self._write_atomic(self._messages_path(conversation_id), data)
+                log_lines = len(conversation.messages)
+            elif pending:
+                # Normal case: only this turn's messages are written
+                async with aiofiles.open(self._messages_path(conversation_id), "ab") as f:
+                    await f.write(b"".join(orjson.dumps(msg) + b"\n" for msg in pending))
+            self._log_lines[conversation_id] = log_lines
+            # These messages are in the log now; a failure below must not append them twice
+            pending = []
+
+            meta = orjson.dumps(self._serialize_conversation(conversation), option=_DUMP_OPTIONS)
+            await self._write_atomic(self._meta_path(conversation_id), meta)
+
+            if conversation_id in self._legacy:
+                await aiofiles.os.remove(self._conversation_path(conversation_id))
+                self._legacy.discard(conversation_id)
         except Exception as e:
             self.logger.error(f"Error saving conversation: {e}", exc_info=True)
-            raise
+            # Keep it dirty so the next flush retries; only unwritten messages are queued again
+            self._pending[conversation_id] = pending + self._pending.get(conversation_id, [])
+            self._dirty.add(conversation_id)
+
+    async def _write_atomic(self, file_path: str, data: bytes):
+        # Write a temp file and swap it in, so a crash mid-write never leaves a truncated file
+        tmp_path = f"{file_path}.tmp"
+        async with aiofiles.open(tmp_path, "wb") as f:
+            await f.write(data)
+        await aiofiles.os.replace(tmp_path, file_path)
 
     def _serialize_conversation(self, conversation: Conversation) -> Dict[str, Any]:
+        """Everything but the messages, which live in the append-only log."""
         return {
-            "messages": [asdict(msg) for msg in conversation.messages],
             "context": conversation.context,
             "metadata": {
                 **conversation.metadata,
@@ -216,27 +383,51 @@ class ConversationManager:
             "updated_at": conversation.updated_at
         }
 
-    def _deserialize_conversation(self, data: Dict[str, Any]) -> Conversation:
-        return Conversation(
-            messages=[Message(**msg) for msg in data["messages"]],
+    def _deserialize_conversation(self, data: Dict[str, Any], messages: List[Message]) -> Conversation:
+        conversation = Conversation(
+            messages=messages,
             context=data["context"],
             metadata={
                 **data["metadata"],
                 "participants": set(data["metadata"].get("participants", []))
             },
             created_at=data["created_at"],
-            updated_at=data["updated_at"]
+            updated_at=data["updated_at"],
+            openai_messages=[{"role": msg.role, "content": msg.content} for msg in messages]
         )
+        self._trim_history(conversation)
+        return conversation
 
     async def reset_conversation(self, user_id: str, channel_id: str) -> None:
         """
-        Deletes the conversation file for the given user and channel, effectively resetting it.
+        Deletes the conversation files for the given user and channel, effectively resetting it.
         """
+        conversation_id = f"{user_id}_{channel_id}"
+        # Wait out an in-flight write, so it cannot recreate the files deleted below
+        lock = self._locks.setdefault(conversation_id, asyncio.Lock())
+        async with lock:
+            await self._reset_conversation_locked(conversation_id)
+        if conversation_id not in self._cache and not lock.locked():
+            self._locks.pop(conversation_id, None)
+
+    async def _reset_conversation_locked(self, conversation_id: str) -> None:
         try:
-            conversation_id = f"{user_id}_{channel_id}"
-            file_path = os.path.join(self.conversations_dir, f"{conversation_id}.json")
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            self._cache.pop(conversation_id, None)
+            self._dirty.discard(conversation_id)
+            self._pending.pop(conversation_id, None)
+            self._log_lines.pop(conversation_id, None)
+            self._legacy.discard(conversation_id)
+            removed = False
+            for file_path in (
+                self._meta_path(conversation_id),
+                self._messages_path(conversation_id),
+                self._conversation_path(conversation_id)
+            ):
+                # Off the event loop: storage may be slow or network-mounted
+                if await aiofiles.os.path.exists(file_path):
+                    await aiofiles.os.remove(file_path)
+                    removed = True
+            if removed:
                 self.logger.info(f"Conversation {conversation_id} reset successfully.")
             else:
                 self.logger.warning(f"No conversation found to reset for {conversation_id}")
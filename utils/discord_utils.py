@@ -1,8 +1,38 @@
 # utils/discord_utils.py
 
 import re
+from functools import lru_cache
 from discord import Interaction, Message
 
+# Inline markers: runs of 4+ asterisks, 3+ underscores or 3+ tildes around some text.
+# They stay within one line, so a match can never swallow the next line's header
+_INLINE_FIXES = (
+    r'(?P<ast>\*{4,}(?P<ast_text>[^*\n]+?)\*{4,})'
+    r'|(?P<und>_{3,}(?P<und_text>[^_\n]+?)_{3,})'
+    r'|(?P<til>~{3,}(?P<til_text>[^~\n]+?)~{3,})'
+)
+_RE_FIX_INLINE = re.compile(_INLINE_FIXES)
+# Header lines are only matched at line starts, so they are tried before the inline markers
+_RE_FIX_ALL = re.compile(
+    r'(?P<h4>^#{4,}\s+(?P<h4_text>.+?)$)'
+    r'|(?P<hsp>^(?P<hsp_marks>#{1,3})(?P<hsp_text>[^\s#].+?)$)'
+    r'|' + _INLINE_FIXES,
+    re.MULTILINE
+)
+_INLINE_MARKERS = {"ast": "***", "und": "__", "til": "~~"}
+_RE_CODE_BLOCK = re.compile(r'```([\w]*)\n.*?```', re.DOTALL)
+
+def _fix_sub(match: re.Match) -> str:
+    """Rewrite one _RE_FIX_ALL match; inline markers inside the rewritten text are fixed too."""
+    kind = match.lastgroup
+    if kind == "h4":
+        return _RE_FIX_INLINE.sub(_fix_sub, f"**{match['h4_text']}**")
+    if kind == "hsp":
+        return _RE_FIX_INLINE.sub(_fix_sub, f"{match['hsp_marks']} {match['hsp_text']}")
+    marker = _INLINE_MARKERS[kind]
+    return marker + _RE_FIX_INLINE.sub(_fix_sub, match[kind + "_text"]) + marker
+
+@lru_cache(maxsize=256)
 def fix_discord_formatting(text: str) -> str:
     """Fix Discord markdown formatting issues before sending messages.
     
@@ -12,6 +42,12 @@ def fix_discord_formatting(text: str) -> str:
     3. Limiting asterisks to maximum of 3 (***) for bold+italic
     4. Limiting underscores to maximum of 2 (__) for underline
     5. Limiting tildes to maximum of 2 (~~) for strikethrough
+
+    All five fixes run in a single scan; see _fix_sub for the per-match rewrite.
+    Results are memoized per input string, since the same summary or recipe text
+    is often fixed again when it is re-sent.
+    Examples: "#### Header" -> "**Header**", "##Header" -> "## Header",
+    "****text****" -> "***text***", "___text___" -> "__text__", "~~~text~~~" -> "~~text~~"
     
     Args:
         text: The text to fix
@@ -19,72 +55,102 @@ def fix_discord_formatting(text: str) -> str:
     Returns:
         Properly formatted text for Discord
     """
-    # Replace header lines with 4+ hashtags with bold formatting
-    # Example: "#### Header" -> "**Header**"
-    text = re.sub(r'^(#{4,})\s+(.+?)$', r'**\2**', text, flags=re.MULTILINE)
-    
-    # Ensure proper spacing after hashtags in headers (# Header, ## Header, ### Header)
-    text = re.sub(r'^(#{1,3})([^\s#].+?)$', r'\1 \2', text, flags=re.MULTILINE)
-    
-    # Fix excessive asterisks (more than 3) - convert to bold+italic
-    # This handles cases like ****text**** -> ***text***
-    text = re.sub(r'\*{4,}([^*]+?)\*{4,}', r'***\1***', text)
-    
-    # Fix excessive underscores (more than 2) - convert to underline
-    # This handles cases like ___text___ -> __text__
-    text = re.sub(r'_{3,}([^_]+?)_{3,}', r'__\1__', text)
-    
-    # Fix excessive tildes (more than 2) - convert to strikethrough
-    # This handles cases like ~~~text~~~ -> ~~text~~
-    text = re.sub(r'~{3,}([^~]+?)~{3,}', r'~~\1~~', text)
+    text = _RE_FIX_ALL.sub(_fix_sub, text)
     
     # Fix mismatched markdown pairs (e.g., different number of opening/closing characters)
     # This is more complex and would require further parsing
     
     return text
 
-async def send_discord_safe(target, full_text: str, wrap_in_markdown: bool = False):
+def format_qa(question: str, answer: str) -> str:
+    """Build the question/answer message used by /ask and mention replies.
+
+    Args:
+        question: The user's question
+        answer: The generated answer
+
+    Returns:
+        The combined message text
+    """
+    return "".join(("**Question:** ", question, "\n\n🧠 **Answer:**\n", answer))
+
+_DASH_BULLET_RE = re.compile(r"(^|\n)-\s")
+_NUM_BULLET_RE = re.compile(r"(^|\n)\d+\.\s")
+
+def looks_like_clean_markdown(text: str) -> bool:
+    """Whether text is already list/recipe markdown that should not be wrapped in a code block."""
+    return bool(
+        "**Ingredients:**" in text or
+        "**Instructions:**" in text or
+        _DASH_BULLET_RE.search(text) or
+        _NUM_BULLET_RE.search(text)
+    )
+
+def _iter_chunks(text: str, limit: int):
+    """Yield slices of text no longer than limit, breaking at the last newline that fits.
+
+    A stretch with no newline in range is cut at exactly limit characters.
+    """
+    i, n = 0, len(text)
+    while n - i > limit:
+        j = text.rfind("\n", i, i + limit + 1)
+        if j <= i:
+            yield text[i:i + limit]
+            i += limit
+        else:
+            yield text[i:j]
+            i = j + 1
+    yield text[i:]
+
+def _fix_prose(text: str, after_code: bool) -> str:
+    """Apply fix_discord_formatting to the text between code blocks.
+
+    Text right after a closing fence continues that line, so it is fixed behind a
+    placeholder character that keeps a leading "#" from being read as a header.
+    """
+    if not after_code:
+        return fix_discord_formatting(text)
+    return fix_discord_formatting("\0" + text)[1:]
+
+async def send_discord_safe(target, full_text: str, wrap_in_markdown: bool = False, *, contains_code: bool = None):
     """Send one or more messages to Discord, respecting the 2000 character limit.
     
     Args:
         target: Either a discord.Interaction or discord.Message object
         full_text: The text to send
         wrap_in_markdown: Whether to wrap the text in markdown code blocks
+        contains_code: Whether full_text contains ``` fences; scanned for when not given
     """
     if len(full_text.strip()) == 0:
         print("[Warning] Tried to send empty message")
         return
 
-    # Extract code blocks to protect them from formatting changes
-    code_blocks = {}
-    code_block_pattern = r'```([\w]*)\n.*?```'
-    
-    # Extract and temporarily replace code blocks with placeholders
-    def replace_code_block(match):
-        placeholder = f"__CODE_BLOCK_{len(code_blocks)}__"
-        code_blocks[placeholder] = match.group(0)
-        return placeholder
-    
-    # Extract code blocks
-    text_without_code = re.sub(code_block_pattern, replace_code_block, full_text, flags=re.DOTALL)
-    
-    # Fix Discord markdown formatting issues on text outside code blocks
-    fixed_text = fix_discord_formatting(text_without_code)
-    
-    # Restore code blocks
-    for placeholder, code_block in code_blocks.items():
-        fixed_text = fixed_text.replace(placeholder, code_block)
+    if contains_code is None:
+        contains_code = "```" in full_text
+
+    # Common case: a reply without code that fits in one message needs no segmenting or packing
+    if not contains_code:
+        fixed_text = fix_discord_formatting(full_text)
+        if len(fixed_text) <= 2000:
+            if wrap_in_markdown and looks_like_clean_markdown(fixed_text):
+                print("[Info] Detected formatted markdown — disabling wrap_in_markdown")
+                wrap_in_markdown = False
+            await _send_chunk(target, fixed_text.strip(), wrap_in_markdown)
+            return
+
+    # Split the text into prose and code block segments in a single scan;
+    # only the prose is reformatted so code blocks are never touched
+    segments = []  # (text, language) pairs, language is None outside code blocks
+    last_end = 0
+    if contains_code:
+        for match in _RE_CODE_BLOCK.finditer(full_text):
+            segments.append((_fix_prose(full_text[last_end:match.start()], last_end > 0), None))
+            segments.append((match.group(0), match.group(1)))
+            last_end = match.end()
+    segments.append((_fix_prose(full_text[last_end:], last_end > 0), None))
     
     # Auto-disable wrapping if content looks like recipe or clean markdown
-    def looks_like_clean_markdown(text):
-        return (
-            "**Ingredients:**" in text or
-            "**Instructions:**" in text or
-            re.search(r"(^|\n)-\s", text) or
-            re.search(r"(^|\n)\d+\.\s", text)
-        )
-
-    if wrap_in_markdown and looks_like_clean_markdown(fixed_text):
+    if wrap_in_markdown and looks_like_clean_markdown("".join(text for text, _ in segments)):
         print("[Info] Detected formatted markdown — disabling wrap_in_markdown")
         wrap_in_markdown = False
 
@@ -96,98 +162,68 @@ async def send_discord_safe(target, full_text: str, wrap_in_markdown: bool = Fal
         # Calculate available space for content (accounting for code block markers)
         max_content_length = 2000 - len("```" + language + "\n\n```")
         
-        chunks = []
-        current_chunk = ""
-        
-        # Split by lines to try to keep logical breaks
-        lines = content.split("\n")
-        for line in lines:
-            if len(current_chunk) + len(line) + 1 > max_content_length:
-                if current_chunk:
-                    chunks.append(f"```{language}\n{current_chunk}\n```")
-                current_chunk = line
-            else:
-                if current_chunk:
-                    current_chunk += "\n"
-                current_chunk += line
-        
-        if current_chunk:
-            chunks.append(f"```{language}\n{current_chunk}\n```")
-        
-        return chunks
+        return [f"```{language}\n{part}\n```" for part in _iter_chunks(content, max_content_length)]
 
-    # Handle code blocks separately
-    code_blocks = re.finditer(r'```([\w]*)\n.*?```', fixed_text, re.DOTALL)
-    code_block_ranges = [(m.start(), m.end(), m.group(1)) for m in code_blocks]
-    
-    # Split the text into chunks, preserving code blocks
+    # Split the text into chunks, preserving code blocks; pieces are collected
+    # in a list and joined once per chunk instead of growing a string
     chunks = []
-    current_chunk = ""
-    last_end = 0
-    
-    for start, end, language in code_block_ranges:
-        # Add text before the code block
-        pre_code = fixed_text[last_end:start]
-        if len(current_chunk) + len(pre_code) > 2000:
-            if current_chunk.strip():
-                chunks.append(current_chunk.strip())
-            current_chunk = pre_code
-        else:
-            current_chunk += pre_code
-        
-        # Handle the code block
-        code_block = fixed_text[start:end]
-        if len(code_block) > 2000:
-            # Split the long code block
-            code_chunks = split_code_block(code_block, language)
-            for code_chunk in code_chunks:
-                if len(current_chunk) + len(code_chunk) > 2000:
-                    if current_chunk.strip():
-                        chunks.append(current_chunk.strip())
-                    current_chunk = code_chunk
-                else:
-                    current_chunk += code_chunk
+    buf: list[str] = []
+    buf_len = 0
+
+    def flush():
+        nonlocal buf_len
+        chunk = "".join(buf).strip()
+        if chunk:
+            chunks.append(chunk)
+        buf.clear()
+        buf_len = 0
+
+    def add_piece(piece: str):
+        nonlocal buf_len
+        if buf_len + len(piece) > 2000:
+            flush()
+            # Chunks are sent stripped, so only text that is still too long once its padding
+            # is gone is cut at line breaks; the tail starts the next chunk
+            if len(piece.strip()) > 2000:
+                *full_parts, piece = _iter_chunks(piece, 2000)
+                chunks.extend(part.strip() for part in full_parts if part.strip())
+        buf.append(piece)
+        buf_len += len(piece)
+
+    for text, language in segments:
+        # Code blocks too long on their own are split, keeping their fences on every part
+        if language is not None and len(text) > 2000:
+            for code_chunk in split_code_block(text, language):
+                add_piece(code_chunk)
         else:
-            if len(current_chunk) + len(code_block) > 2000:
-                if current_chunk.strip():
-                    chunks.append(current_chunk.strip())
-                current_chunk = code_block
-            else:
-                current_chunk += code_block
-        
-        last_end = end
-    
-    # Add any remaining text
-    remaining_text = fixed_text[last_end:]
-    if len(current_chunk) + len(remaining_text) > 2000:
-        if current_chunk.strip():
-            chunks.append(current_chunk.strip())
-        current_chunk = remaining_text
-    else:
-        current_chunk += remaining_text
-    
-    if current_chunk.strip():
-        chunks.append(current_chunk.strip())
+            add_piece(text)
+
+    flush()
 
     # Send each chunk
     for chunk in chunks:
-        chunk = chunk.strip()
-        if not chunk:
-            continue
+        await _send_chunk(target, chunk, wrap_in_markdown)
 
-        if wrap_in_markdown and not chunk.startswith("```"):
-            msg = f"```markdown\n{chunk}\n```"
-        else:
-            msg = chunk
 
-        if len(msg) > 2000:
-            print(f"[Error] Chunk too long even after split: {len(msg)} chars")
-            msg = msg[:1997] + "..."
+async def _send_chunk(target, chunk: str, wrap_in_markdown: bool):
+    """Send one chunk as a reply or followup, wrapping and truncating it as needed."""
+    chunk = chunk.strip()
+    if not chunk:
+        return
 
-        # Handle both Interaction and Message objects
-        if isinstance(target, Interaction):
-            await target.followup.send(msg)
-        elif isinstance(target, Message):
-            await target.reply(msg)
-        else:
-            raise TypeError("target must be either a discord.Interaction or discord.Message object")
+    if wrap_in_markdown and not chunk.startswith("```"):
+        msg = f"```markdown\n{chunk}\n```"
+    else:
+        msg = chunk
+
+    if len(msg) > 2000:
+        print(f"[Error] Chunk too long even after split: {len(msg)} chars")
+        msg = msg[:1997] + "..."
+
+    # Handle both Interaction and Message objects
+    if isinstance(target, Interaction):
+        await target.followup.send(msg)
+    elif isinstance(target, Message):
+        await target.reply(msg)
+    else:
+        raise TypeError("target must be either a discord.Interaction or discord.Message object")
@@ -0,0 +1,24 @@
+# utils/http.py
+
+import httpx
+
+# One pooled client for every HTTP API call in the process, so connections
+# (and their TLS sessions) are reused across requests and modules
+_client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared AsyncClient, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            limits=httpx.Limits(max_keepalive_connections=16, max_connections=64, keepalive_expiry=30.0)
+        )
+    return _client
+
+
+async def aclose_client():
+    """Close the shared client; call once on bot shutdown."""
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
@@ -4,49 +4,105 @@ from datetime import datetime
 import asyncio
 from utils.discord_utils import fix_discord_formatting
 
+# Section headers recognised at the start of a line, optionally behind markdown
+# markers ("## Directions", "**Ingredients:**"). Longer forms come first so
+# "ingredients" is tried before "ingredient".
+_SECTION_HEADERS = (
+    "ingredients", "ingredient", "instructions", "instruction", "directions", "direction",
+    "steps", "step", "method", "how to make", "preparation", "procedure", "cooking steps",
+    "notes", "special equipment", "make-ahead", "storage", "nutrition facts",
+)
+_HEADER_PREFIX_LEN = max(map(len, _SECTION_HEADERS)) + 1
+_HEADER_MARKS = " \t#*_"
+_EMPHASIS_MARKS = " \t*_"
+_ITEM_STRIP = "-• \t"
+_NOTE_HEADERS = {"notes", "special equipment", "make-ahead", "storage", "nutrition facts"}
+# Prep-style labels ("Preparation: 10 minutes") end the ingredients but never open the instructions
+_PREP_HEADERS = {"how to make", "preparation", "procedure"}
+
+# Which header kinds end a section of the given kind
+_SECTION_ENDS = {
+    "ingredients": {"instructions", "prep"},
+    "instructions": {"notes"},
+}
+
+
+def _section_kind(name: str) -> str:
+    name = name.lower()
+    if name.startswith("ingredient"):
+        return "ingredients"
+    if name in _NOTE_HEADERS:
+        return "notes"
+    if name in _PREP_HEADERS:
+        return "prep"
+    return "instructions"
+
+
+def _match_header(line: str) -> Optional[tuple]:
+    """Return (kind, opens_section, rest_of_line) if the line starts with a section header."""
+    head = line.lstrip(_HEADER_MARKS)
+    low = head[:_HEADER_PREFIX_LEN].lower()
+    if not low.startswith(_SECTION_HEADERS):
+        return None
+    for name in _SECTION_HEADERS:
+        if not low.startswith(name):
+            continue
+        rest = head[len(name):]
+        if rest[:1].isalnum() or rest[:1] == "_":
+            continue
+        # Skip closing emphasis too, so "**Ingredients**:" reads like "Ingredients:"
+        after = rest.lstrip(_EMPHASIS_MARKS)
+        colon = after.startswith(":")
+        # Only "Name:" or a markdown heading opens a section; any header line can end one
+        opens = colon or "#" in line[:len(line) - len(head)]
+        # The "**" closing "**Ingredients:**" is markup, not the section's first item
+        rest = (after[1:] if colon else rest).strip(_EMPHASIS_MARKS)
+        return _section_kind(name), opens, rest
+    return None
+
 
 class RecipeDetector:
+    TITLE_PATTERN = re.compile(r"title[:\-]\s*(.+)", re.IGNORECASE)
+
     def __init__(self):
+        # Compiled once here; the extractors only ever call .search on them
         self.recipe_patterns = {
-            "ingredients": [
-                r'ingredients?:\s*(.+?)(?=\n\s*(instructions|directions|steps|method|how to make|preparation|procedure|cooking steps))',
-                r'##\s*Ingredients\s*(.+?)(?=\n\s*##\s*(Directions|Instructions|Steps))'
-            ],
-            "instructions": [
-                r'instructions?:\s*(.+?)(?=\n\s*(notes|special equipment|make-ahead|storage|nutrition facts|$))',
-                r'directions?:\s*(.+?)(?=\n\s*(notes|$))',
-                r'steps?:\s*(.+?)(?=\n\s*(notes|$))',
-                r'method:\s*(.+?)(?=\n\s*(notes|$))',
-                r'##\s*Directions\s*(.+?)(?=\n\s*##)'
-            ],
-            "servings": [
+            "servings": [re.compile(p, re.IGNORECASE) for p in (
                 r'serves?\s*(\d+(?:\s*to\s*\d+)?)',
                 r'makes?\s*(\d+(?:\s*to\s*\d+)?)',
                 r'yield:\s*(\d+(?:\s*to\s*\d+)?)'
-            ],
-            "prep_time": [
+            )],
+            "prep_time": [re.compile(p, re.IGNORECASE) for p in (
                 r'prep(?:aration)?\s*time:\s*([^\n]+)',
                 r'prep:\s*([^\n]+)'
-            ],
-            "cook_time": [
+            )],
+            "cook_time": [re.compile(p, re.IGNORECASE) for p in (
                 r'cook(?:ing)?\s*time:\s*([^\n]+)',
                 r'cook:\s*([^\n]+)'
-            ],
-            "total_time": [
+            )],
+            "total_time": [re.compile(p, re.IGNORECASE) for p in (
                 r'total\s*time:\s*([^\n]+)',
                 r'ready\s*in:\s*([^\n]+)'
-            ]
+            )]
         }
 
     def detect_recipe(self, text: str) -> Optional[Dict]:
-        ingredients = self._extract_list_field(text, self.recipe_patterns["ingredients"])
-        instructions = self._extract_list_field(text, self.recipe_patterns["instructions"])
+        # A recipe needs an "Ingredients" section, so most non-recipe text is
+        # rejected here by one substring check before any line or regex work
+        if "ingredient" not in text.lower():
+            return None
+
+        # Split once; section detection and the title fallback share the lines
+        lines = text.splitlines()
+        sections = self._extract_sections(lines)
+        ingredients = sections.get("ingredients")
+        instructions = sections.get("instructions")
 
         if not ingredients or not instructions:
             return None
 
         return {
-            "title": self._guess_title(text),
+            "title": self._guess_title(text, lines),
             "ingredients": ingredients,
             "instructions": instructions,
             "servings": self._extract_field(text, self.recipe_patterns["servings"]),
@@ -56,27 +112,55 @@ class RecipeDetector:
             "extracted_at": datetime.now().isoformat()
         }
 
-    def _extract_list_field(self, text: str, patterns: List[str]) -> Optional[List[str]]:
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
+    def _extract_sections(self, lines: List[str]) -> Dict[str, List[str]]:
+        headers = []
+        for i, line in enumerate(lines):
+            match = _match_header(line)
             if match:
-                section = match.group(1).strip()
-                return [line.strip("-• \t").strip() for line in section.splitlines() if line.strip()]
-        return None
+                headers.append((i, *match))
 
-    def _extract_field(self, text: str, patterns: List[str]) -> Optional[str]:
+        sections = {}
+        for h, (start, kind, opens, rest) in enumerate(headers):
+            if not opens or kind in sections or kind not in _SECTION_ENDS:
+                continue
+            ends = _SECTION_ENDS[kind]
+            end = next((i for i, other, _, _ in headers[h + 1:] if other in ends), len(lines))
+            items = [item.strip(_ITEM_STRIP).strip() for item in (rest, *lines[start + 1:end])]
+            items = [item for item in items if item]
+            if items:
+                sections[kind] = items
+        return sections
+
+    def _extract_field(self, text: str, patterns: List[re.Pattern]) -> Optional[str]:
         for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+            match = pattern.search(text)
             if match:
                 return match.group(1).strip()
         return None
 
-    def _guess_title(self, text: str) -> str:
-        match = re.search(r"title[:\-]\s*(.+)", text, re.IGNORECASE)
+    def _guess_title(self, text: str, lines: List[str]) -> str:
+        match = self.TITLE_PATTERN.search(text)
         if match:
             return match.group(1).strip()
-        lines = text.strip().splitlines()
-        return lines[0].strip() if lines else "Untitled Recipe"
+        return next((line.strip() for line in lines if line.strip()), "Untitled Recipe")
+
+
+# The detector holds only compiled patterns, so one instance serves every caller
+_detector = RecipeDetector()
+
+
+def detect_recipe_from_text(text: str) -> Optional[Dict]:
+    return _detector.detect_recipe(text)
+
+
+def _clean_dedup(items: List[str]) -> List[str]:
+    """Strip items and drop blanks and exact duplicates, keeping first-seen order."""
+    seen = {}
+    for item in items:
+        item = item.strip()
+        if item:
+            seen[item] = None
+    return list(seen)
 
 
 def format_recipe_markdown(recipe: dict, limit: int = 1800) -> str:
@@ -88,13 +172,9 @@ def format_recipe_markdown(recipe: dict, limit: int = 1800) -> str:
     ingredients = recipe.get("ingredients", [])
     instructions = recipe.get("instructions", [])
 
-    # Deduplicate and clean ingredients
-    ingredients = [i.strip() for i in ingredients if i.strip()]
-    ingredients = list(dict.fromkeys(ingredients))  # remove exact duplicates
-
-    # Deduplicate and clean instructions
-    instructions = [i.strip() for i in instructions if i.strip()]
-    instructions = list(dict.fromkeys(instructions))
+    # Deduplicate and clean ingredients and instructions
+    ingredients = _clean_dedup(ingredients)
+    instructions = _clean_dedup(instructions)
 
     lines = [f"**📋 Full Recipe Card**\n**{title}**"]
 
@@ -131,16 +211,21 @@ def format_recipe_markdown(recipe: dict, limit: int = 1800) -> str:
         lines.append("\n**Notes:**")
         lines.append(f"- {recipe['notes'].strip()}")
 
-    # Combine lines while respecting the character limit
-    final_output = ""
+    # Combine lines while respecting the character limit, tracking the length
+    # as we go and joining once at the end
+    kept = []
+    total = 0
+    cap = limit - 5
     cutoff_reached = False
 
     for line in lines:
-        if len(final_output) + len(line) + 1 > limit - 5:
+        total += len(line) + 1
+        if total > cap:
             cutoff_reached = True
             break
-        final_output += line + "\n"
+        kept.append(line)
 
+    final_output = "\n".join(kept) + "\n" if kept else ""
     if cutoff_reached:
         final_output = final_output.rstrip() + "\n[...]"
         
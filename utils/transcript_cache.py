@@ -0,0 +1,43 @@
+# utils/transcript_cache.py
+
+import gzip
+import logging
+import os
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Raw transcripts ({"text", "start", "duration"} entries) never change once published,
+# so they are kept on disk indefinitely and survive restarts
+TRANSCRIPT_CACHE_DIR = os.getenv("TRANSCRIPT_CACHE_DIR", os.path.join("storage", "transcripts"))
+
+
+def _cache_path(video_id: str, lang: str) -> str:
+    return os.path.join(TRANSCRIPT_CACHE_DIR, f"{video_id}.{lang}.json.gz")
+
+
+def get(video_id: str, lang: str = "en"):
+    """Return the cached raw transcript for a video, or None if there is none."""
+    try:
+        with gzip.open(_cache_path(video_id, lang), "rb") as f:
+            return orjson.loads(f.read())
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, orjson.JSONDecodeError) as e:
+        logger.warning(f"Ignoring unreadable transcript cache for {video_id}: {e}")
+        return None
+
+
+def put(video_id: str, data: list, lang: str = "en"):
+    """Store a raw transcript; failures are logged and otherwise ignored."""
+    path = _cache_path(video_id, lang)
+    tmp_path = path + ".tmp"
+    try:
+        os.makedirs(TRANSCRIPT_CACHE_DIR, exist_ok=True)
+        with gzip.open(tmp_path, "wb") as f:
+            f.write(orjson.dumps(data))
+        # Readers never see a partially written file
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Failed to cache transcript for {video_id}: {e}")
@@ -1,8 +1,16 @@
-import json
+import asyncio
+import atexit
 import logging
+import os
+import time
 from pathlib import Path
 from typing import Dict, Any
 
+import orjson
+
+# Saves are batched: changed users are written this many seconds after the first change
+FLUSH_DELAY = 2.0
+
 class UserManager:
     def __init__(self, settings_dir: str):
         self.logger = logging.getLogger(__name__)
@@ -10,7 +18,11 @@ class UserManager:
         self.users_dir = self.settings_dir / "users"
         self.users_dir.mkdir(parents=True, exist_ok=True)
         self.user_settings: Dict[str, Dict[str, Any]] = {}
+        self._dirty: set = set()
+        self._flush_handle = None
         self._load_all_users()
+        # Anything still pending when the process exits is written out
+        atexit.register(self.flush)
 
     def _user_file(self, user_id: str) -> Path:
         return self.users_dir / f"{user_id}.json"
@@ -19,39 +31,55 @@ class UserManager:
         for user_file in self.users_dir.glob("*.json"):
             try:
                 user_id = user_file.stem
-                with open(user_file, "r", encoding="utf-8") as f:
-                    self.user_settings[user_id] = json.load(f)
+                with open(user_file, "rb") as f:
+                    self.user_settings[user_id] = orjson.loads(f.read())
             except Exception as e:
                 self.logger.warning(f"Failed to load user {user_file.name}: {e}")
 
     def load_user_data(self, user_id: str) -> Dict[str, Any]:
+        # _load_all_users already read every file on disk, so a miss is a new user
         if user_id in self.user_settings:
             return self.user_settings[user_id]
-
-        file_path = self._user_file(user_id)
-        if file_path.exists():
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    self.user_settings[user_id] = data
-                    return data
-            except Exception as e:
-                self.logger.error(f"Error reading user data for {user_id}: {e}")
-
         return self._create_default_user(user_id)
 
     def _create_default_user(self, user_id: str) -> Dict[str, Any]:
         data = {
-            "joined": str(Path().stat().st_ctime),
+            "joined": str(time.time()),
             "preferences": {},
         }
         self.save_user_data(user_id, data)
         return data
 
     def save_user_data(self, user_id: str, data: Dict[str, Any]):
+        """Record the user's data; it is written to disk shortly after."""
+        self.user_settings[user_id] = data
+        self._dirty.add(user_id)
+        if self._flush_handle is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop to debounce on (e.g. a script), so write right away
+            self.flush()
+            return
+        self._flush_handle = loop.call_later(FLUSH_DELAY, self.flush)
+
+    def flush(self):
+        """Write all changed users to disk; call once more on shutdown."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        dirty, self._dirty = self._dirty, set()
+        for user_id in dirty:
+            self._write_user(user_id)
+
+    def _write_user(self, user_id: str):
+        file_path = self._user_file(user_id)
+        tmp_path = file_path.with_name(file_path.name + ".tmp")
         try:
-            with open(self._user_file(user_id), "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2)
-            self.user_settings[user_id] = data
+            # Write a temp file and swap it in, so a crash mid-write never leaves a truncated file
+            with open(tmp_path, "wb") as f:
+                f.write(orjson.dumps(self.user_settings[user_id], option=orjson.OPT_INDENT_2))
+            os.replace(tmp_path, file_path)
         except Exception as e:
-            self.logger.error(f"Error saving user data for {user_id}: {e}")
+            self.logger.error(f"Error saving user data for {user_id}: {e}")
\ No newline at end of file
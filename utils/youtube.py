@@ -3,25 +3,62 @@ import os
 import re
 from datetime import datetime
 import logging
-from googleapiclient.discovery import build
-from youtube_transcript_api import YouTubeTranscriptApi
-from youtube_transcript_api.formatters import TextFormatter
+# googleapiclient and youtube_transcript_api are heavy to import and only needed once a
+# YouTube link is actually processed, so they are imported where they are used
 from summarizer.summarizer import summarize_article_full
 from utils.discord_utils import fix_discord_formatting
+from utils import transcript_cache
+from utils.async_cache import AsyncCache
 from config.config import YOUTUBE_API_KEY
-import openai
-# from utils.recipe import RecipeDetector
+from openai import AsyncOpenAI
+# from utils.recipe import detect_recipe_from_text
 import asyncio
 
-# recipe_detector = RecipeDetector()
+# Video IDs are always 11 chars, which also drops trailing &t=30s style params
+_YT_ID_RE = re.compile(r"(?:v=|youtu\.be/|shorts/|embed/)([A-Za-z0-9_-]{11})")
+_YT_DURATION_RE = re.compile(r"PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?")
 
 
-async def process_youtube_video(video_id: str, summary_type: str = "default") -> dict:
-    transcript = YouTubeTranscriptApi.get_transcript(video_id)
-    text = "\n".join(entry["text"] for entry in transcript)
+# Transcripts never change, so keep recent ones for the life of the process
+TRANSCRIPT_CACHE_MAX_ENTRIES = 256
+_transcripts = AsyncCache(TRANSCRIPT_CACHE_MAX_ENTRIES)
+
+# Roughly 100k tokens at ~4 characters per token; anything longer is cut before summarizing
+TRANSCRIPT_MAX_CHARS = 400_000
+
+
+# Titles and view counts drift slowly; a short TTL spares the Data API repeat lookups
+VIDEO_DETAILS_TTL = 900
+VIDEO_DETAILS_MAX_ENTRIES = 512
+_details_cache = AsyncCache(VIDEO_DETAILS_MAX_ENTRIES, ttl=VIDEO_DETAILS_TTL)
+
+
+async def fetch_transcript_text(video_id: str) -> str:
+    """Return a video's transcript as newline-joined text.
+
+    Concurrent requests for the same video share a single download.
+    """
+    return await _transcripts.get_or_create(video_id, lambda: _download_transcript(video_id))
+
+
+async def _download_transcript(video_id: str) -> str:
+    transcript = await asyncio.to_thread(transcript_cache.get, video_id)
+    if transcript is None:
+        from youtube_transcript_api import YouTubeTranscriptApi
+        # get_transcript is a blocking HTTP call; keep it off the event loop
+        transcript = await asyncio.to_thread(YouTubeTranscriptApi.get_transcript, video_id)
+        await asyncio.to_thread(transcript_cache.put, video_id, transcript)
+    return "\n".join(entry["text"] for entry in transcript)
+
+
+async def process_youtube_video(video_id: str, summary_type: str = "default", max_final_chars: int = 1800) -> dict:
+    text = await fetch_transcript_text(video_id)
     print("[Transcript Preview]", text[:50], "...")
+    if len(text) > TRANSCRIPT_MAX_CHARS:
+        print(f"[Transcript] Truncating {len(text)} characters to {TRANSCRIPT_MAX_CHARS}")
+        text = text[:TRANSCRIPT_MAX_CHARS]
 
-    # recipe = recipe_detector.detect_recipe(text)
+    # recipe = detect_recipe_from_text(text)
     # if recipe:
     #     return {
     #         "type": "recipe",
@@ -44,6 +81,7 @@ async def process_youtube_video(video_id: str, summary_type: str = "default") ->
     summary = await summarize_article_full(
         text=text,
         summary_type=summary_type,
+        max_final_chars=max_final_chars,
         title=video_title,
         url=video_url
     )
@@ -63,15 +101,17 @@ class YouTubeManager:
             api_key: YouTube API key
         """
         self.api_key = api_key
-        self.youtube = build('youtube', 'v3', developerKey=api_key)
+        # Building the client fetches and parses the discovery document, so defer it to first use
+        self._youtube = None
         self.logger = logging.getLogger(__name__)
         # self.recipe_manager = RecipeManager()
-        self.formatter = TextFormatter()
+        self._formatter = None
         
         # Configure DeepSeek API
         self.deepseek_api_key = os.getenv('DEEPSEEK_API_KEY')
         if not self.deepseek_api_key:
             raise ValueError("DEEPSEEK_API_KEY environment variable not set")
+        self._deepseek_client = None
         
         # Configure logger to handle Unicode
         for handler in self.logger.handlers:
@@ -80,6 +120,29 @@ class YouTubeManager:
             elif isinstance(handler, logging.FileHandler):
                 handler.setStream(open(handler.baseFilename, mode=handler.mode, encoding='utf-8'))
         
+    @property
+    def youtube(self):
+        """YouTube Data API client, built on first use."""
+        if self._youtube is None:
+            from googleapiclient.discovery import build
+            self._youtube = build('youtube', 'v3', developerKey=self.api_key)
+        return self._youtube
+
+    @property
+    def deepseek_client(self) -> AsyncOpenAI:
+        """DeepSeek chat client, created on first use."""
+        if self._deepseek_client is None:
+            self._deepseek_client = AsyncOpenAI(api_key=self.deepseek_api_key, base_url="https://api.deepseek.com")
+        return self._deepseek_client
+
+    @property
+    def formatter(self):
+        """Transcript text formatter, created the first time get_transcript needs it."""
+        if self._formatter is None:
+            from youtube_transcript_api.formatters import TextFormatter
+            self._formatter = TextFormatter()
+        return self._formatter
+
     def extract_video_id(self, url: str) -> Optional[str]:
         """Extract video ID from various YouTube URL formats.
         
@@ -89,16 +152,8 @@ class YouTubeManager:
         Returns:
             str: Video ID if found, None otherwise
         """
-        patterns = [
-            r'(?:youtube\.com\/watch\?v=|youtu.be\/|youtube.com\/embed\/)([^&\n?#]+)',
-            r'youtube.com\/shorts\/([^&\n?#]+)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return match.group(1)
-        return None
+        match = _YT_ID_RE.search(url)
+        return match.group(1) if match else None
     
     async def get_video_details(self, url: str) -> Dict:
         """Get video details from YouTube API."""
@@ -107,13 +162,18 @@ class YouTubeManager:
             if not video_id:
                 raise ValueError("Invalid YouTube URL")
 
+            cached = _details_cache.get(video_id)
+            if cached is not None:
+                return dict(cached)
+
             # Get video details from YouTube API
             try:
                 request = self.youtube.videos().list(
                     part="snippet,contentDetails,statistics",
                     id=video_id
                 )
-                response = request.execute()
+                # execute() is a blocking HTTP call; keep it off the event loop
+                response = await asyncio.to_thread(request.execute)
             except Exception as e:
                 error_msg = str(e)
                 self.logger.error(f"YouTube API error: {error_msg}")
@@ -133,13 +193,16 @@ class YouTubeManager:
 
             video = response['items'][0]
             
-            return {
+            details = {
                 'title': video['snippet']['title'],
                 'channel': video['snippet']['channelTitle'],
                 'duration': video['contentDetails']['duration'],
                 'views': int(video['statistics']['viewCount']),
                 'thumbnail': video['snippet']['thumbnails']['high']['url'] if 'thumbnails' in video['snippet'] else None
             }
+            _details_cache.set(video_id, details)
+            # Callers get their own copy so edits never leak into the cache
+            return dict(details)
         except ValueError as ve:
             self.logger.error(f"Value error in get_video_details: {str(ve)}")
             raise
@@ -161,60 +224,29 @@ class YouTubeManager:
                 self.logger.error("Invalid YouTube URL")
                 return None
 
-            # Get transcript list
-            try:
-                transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-            except Exception as e:
-                error_msg = str(e)
-                self.logger.error(f"Error getting transcript list: {error_msg}")
-                if "videoNotFound" in error_msg:
-                    self.logger.error(f"Video {video_id} not found")
-                    return None
-                elif "transcriptsDisabled" in error_msg:
-                    self.logger.error(f"Transcripts are disabled for video {video_id}")
-                    return None
-                else:
-                    self.logger.error(f"Unexpected error getting transcript list: {error_msg}")
+            transcript_data = await asyncio.to_thread(transcript_cache.get, video_id)
+            if transcript_data is not None:
+                self.logger.info(f"Using cached transcript for video {video_id}")
+            else:
+                # Listing and fetching transcripts are blocking HTTP calls; keep them off the event loop
+                transcript_data = await asyncio.to_thread(self._fetch_english_transcript, video_id)
+                if transcript_data is None:
                     return None
-            
-            # Try to get manual English transcript first
-            try:
-                transcript = transcript_list.find_manually_created_transcript(['en'])
-                self.logger.info(f"Found manual English transcript for video {video_id}")
-            except Exception as e:
-                self.logger.info(f"No manual English transcript found for video {video_id}, trying auto-generated")
-                # If no manual transcript, try auto-generated English
-                try:
-                    transcript = transcript_list.find_generated_transcript(['en'])
-                    self.logger.info(f"Found auto-generated English transcript for video {video_id}")
-                except Exception as e:
-                    error_msg = str(e)
-                    self.logger.error(f"Failed to get English transcript for video {video_id}: {error_msg}")
-                    if "transcriptsDisabled" in error_msg:
-                        self.logger.error(f"Auto-generated transcripts are disabled for video {video_id}")
-                        return None
-                    elif "noTranscriptFound" in error_msg:
-                        self.logger.error(f"No English transcript available for video {video_id}")
-                        return None
-                    else:
-                        self.logger.error(f"Unexpected error getting auto-generated transcript: {error_msg}")
-                        return None
+                await asyncio.to_thread(transcript_cache.put, video_id, transcript_data)
 
-            # Get transcript
+            # Format transcript
             try:
-                transcript_data = transcript.fetch()
-                if not transcript_data:
-                    self.logger.error(f"Empty transcript data received for video {video_id}")
-                    return None
-                    
-                formatted_transcript = self.formatter.format_transcript(transcript_data)
+                from youtube_transcript_api import FetchedTranscriptSnippet
+                formatted_transcript = self.formatter.format_transcript(
+                    [FetchedTranscriptSnippet(**entry) for entry in transcript_data]
+                )
                 if not formatted_transcript:
                     self.logger.error(f"Empty formatted transcript for video {video_id}")
                     return None
                     
                 self.logger.info(f"Successfully fetched transcript for video {video_id}")
             except Exception as e:
-                self.logger.error(f"Error fetching or formatting transcript: {str(e)}")
+                self.logger.error(f"Error formatting transcript: {str(e)}")
                 return None
             
             result = {'transcript': formatted_transcript}
@@ -241,6 +273,63 @@ class YouTubeManager:
             self.logger.error(f"Unexpected error in get_transcript: {str(e)}")
             return None
     
+    def _fetch_english_transcript(self, video_id: str) -> Optional[List[Dict]]:
+        """Fetch a video's English transcript (manual preferred) as raw snippet dicts.
+
+        Returns:
+            List of {"text", "start", "duration"} dicts, or None if unavailable
+        """
+        from youtube_transcript_api import YouTubeTranscriptApi
+
+        # Get transcript list
+        try:
+            transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
+        except Exception as e:
+            error_msg = str(e)
+            self.logger.error(f"Error getting transcript list: {error_msg}")
+            if "videoNotFound" in error_msg:
+                self.logger.error(f"Video {video_id} not found")
+                return None
+            elif "transcriptsDisabled" in error_msg:
+                self.logger.error(f"Transcripts are disabled for video {video_id}")
+                return None
+            else:
+                self.logger.error(f"Unexpected error getting transcript list: {error_msg}")
+                return None
+
+        # Try to get manual English transcript first
+        try:
+            transcript = transcript_list.find_manually_created_transcript(['en'])
+            self.logger.info(f"Found manual English transcript for video {video_id}")
+        except Exception as e:
+            self.logger.info(f"No manual English transcript found for video {video_id}, trying auto-generated")
+            # If no manual transcript, try auto-generated English
+            try:
+                transcript = transcript_list.find_generated_transcript(['en'])
+                self.logger.info(f"Found auto-generated English transcript for video {video_id}")
+            except Exception as e:
+                error_msg = str(e)
+                self.logger.error(f"Failed to get English transcript for video {video_id}: {error_msg}")
+                if "transcriptsDisabled" in error_msg:
+                    self.logger.error(f"Auto-generated transcripts are disabled for video {video_id}")
+                    return None
+                elif "noTranscriptFound" in error_msg:
+                    self.logger.error(f"No English transcript available for video {video_id}")
+                    return None
+                else:
+                    self.logger.error(f"Unexpected error getting auto-generated transcript: {error_msg}")
+                    return None
+
+        try:
+            transcript_data = transcript.fetch().to_raw_data()
+        except Exception as e:
+            self.logger.error(f"Error fetching transcript: {str(e)}")
+            return None
+        if not transcript_data:
+            self.logger.error(f"Empty transcript data received for video {video_id}")
+            return None
+        return transcript_data
+
     def format_duration(self, duration: str) -> str:
         """Convert YouTube duration format to readable format.
         
@@ -250,7 +339,7 @@ class YouTubeManager:
         Returns:
             str: Formatted duration string
         """
-        match = re.match(r'PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?', duration)
+        match = _YT_DURATION_RE.match(duration)
         if not match:
             return "Unknown duration"
             
@@ -295,12 +384,8 @@ class YouTubeManager:
                     f"by {video_details['channel']}. Focus on the main points:\n\n{transcript}"
                 )
 
-            # Configure DeepSeek API
-            openai.api_key = self.deepseek_api_key
-            openai.api_base = "https://api.deepseek.com"
-
             # Get summary from DeepSeek
-            response = await openai.ChatCompletion.acreate(
+            response = await self.deepseek_client.chat.completions.create(
                 model="deepseek-chat",
                 messages=[
                     {"role": "system", "content": system_prompt},